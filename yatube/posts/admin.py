@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Comment, Follow, Group, Post
+from .models import Comment, Follow, Group, Post, Task
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -31,7 +31,15 @@ class FollowAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'args', 'status', 'attempts', 'run_at')
+    search_fields = ('name', )
+    list_filter = ('status', 'name')
+    empty_value_display = '-пусто-'
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(Task, TaskAdmin)
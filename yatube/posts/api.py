@@ -0,0 +1,123 @@
+"""JSON-версии лент и страницы поста только для чтения.
+
+Строки берутся через ``values()`` без создания объектов моделей и
+отдаются потоком по мере чтения из базы.
+"""
+import json
+
+from django.conf import settings
+from django.db import router
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+
+from .models import Comment, Group, Post, User
+from .paginators import CursorEncoder, CursorPaginator, InvalidCursor
+from .timeline import timeline_posts
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'author__username', 'group__slug',
+               'image', 'image_width', 'image_height', 'comment_count',
+               'thumbnail_url', 'thumbnail_width', 'thumbnail_height',
+               'thumbnail_manifest')
+COMMENT_FIELDS = ('id', 'author__username', 'text', 'created')
+RENAMED = {'author__username': 'author', 'group__slug': 'group'}
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+
+
+def _dumps(value):
+    return json.dumps(value, cls=CursorEncoder, ensure_ascii=False)
+
+
+def _rename(row):
+    for source, target in RENAMED.items():
+        if source in row:
+            row[target] = row.pop(source)
+    return row
+
+
+def serialize_post(row):
+    row = _rename(row)
+    row['image'] = IMAGE_STORAGE.url(row['image']) if row['image'] else None
+    manifest = row.pop('thumbnail_manifest')
+    row['thumbnails'] = json.loads(manifest) if manifest else []
+    return row
+
+
+def _stream(stream, serialize, head='{"results": ['):
+    yield head
+    for number, row in enumerate(stream):
+        yield (',' if number else '') + _dumps(serialize(row))
+    yield (f'], "next": {_dumps(stream.next_cursor)}, '
+           f'"previous": {_dumps(stream.previous_cursor)}}}')
+
+
+def page_size(request, default=None):
+    default = default or settings.POSTS_IN_PAGE
+    try:
+        size = int(request.GET.get('limit', default))
+    except ValueError:
+        size = default
+    return max(1, min(size, settings.API_MAX_PAGE_SIZE))
+
+
+def cursor_stream(request, paginator):
+    """Страница по курсорам ``after``/``before`` из запроса."""
+    return paginator.cursor_stream(after=request.GET.get('after'),
+                                   before=request.GET.get('before'))
+
+
+def invalid_cursor():
+    return JsonResponse({'detail': 'Неверный курсор'}, status=400)
+
+
+def feed_response(request, posts):
+    """Поток страницы ленты по курсорам ``after``/``before``."""
+    # база выбирается сейчас: поток читается уже после выхода из
+    # middleware, закрепляющего запрос за основной базой
+    posts = posts.using(router.db_for_read(Post)).values(*POST_FIELDS)
+    paginator = CursorPaginator(posts, page_size(request))
+    try:
+        stream = cursor_stream(request, paginator)
+    except InvalidCursor:
+        return invalid_cursor()
+    return StreamingHttpResponse(_stream(stream, serialize_post),
+                                 content_type='application/json')
+
+
+def index(request):
+    return feed_response(request, Post.objects.for_feed())
+
+
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.for_feed())
+
+
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.for_feed())
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Нужна авторизация'}, status=401)
+    return feed_response(request, timeline_posts(request.user))
+
+
+def post_view(request, username, post_id):
+    """Пост и страница его комментариев по тем же курсорам, что у лент."""
+    database = router.db_for_read(Post)
+    post = get_object_or_404(
+        Post.objects.using(database).values(*POST_FIELDS),
+        author__username=username, id=post_id)
+    comments = (Comment.objects.using(database).filter(post_id=post_id)
+                .values(*COMMENT_FIELDS))
+    paginator = CursorPaginator(
+        comments, page_size(request, settings.COMMENTS_IN_PAGE),
+        ordering=('created', 'id'))
+    try:
+        stream = cursor_stream(request, paginator)
+    except InvalidCursor:
+        return invalid_cursor()
+    head = f'{{"post": {_dumps(serialize_post(post))}, "comments": ['
+    return StreamingHttpResponse(_stream(stream, _rename, head),
+                                 content_type='application/json')
@@ -3,3 +3,13 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from django.conf import settings
+        from PIL import Image
+        # Pillow отказывается открывать картинки больше этого предела
+        Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+        if settings.TEMPLATES_WARM_UP:
+            from .templating import warm_templates
+            warm_templates()
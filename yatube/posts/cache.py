@@ -0,0 +1,90 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+FEED_VERSION_KEY = 'posts:feed_version'
+COUNT_KEY = 'posts:count:{}'
+
+
+def get_cache():
+    """Кэш приложения; его ``incr`` должен быть атомарным между процессами."""
+    return caches[settings.POSTS_CACHE]
+
+
+def _start_version(cache):
+    # вытесненный счётчик начинается с нового значения, а не с единицы,
+    # чтобы не совпасть со старыми ключами фрагментов
+    cache.add(FEED_VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+def feed_version():
+    cache = get_cache()
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        _start_version(cache)
+        version = cache.get(FEED_VERSION_KEY)
+    return version
+
+
+def bump_feed_version():
+    """Делает недействительными все закэшированные фрагменты лент."""
+    cache = get_cache()
+    try:
+        cache.incr(FEED_VERSION_KEY)
+    except ValueError:
+        _start_version(cache)
+
+
+def _variant(request):
+    user = request.user
+    return f'user-{user.pk}' if user.is_authenticated else 'anon'
+
+
+def cached_count(name, queryset):
+    """Количество постов ленты из кэша; ``COUNT(*)`` только при промахе."""
+    cache = get_cache()
+    key = COUNT_KEY.format(name)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.add(key, count, timeout=settings.POSTS_COUNT_TIMEOUT)
+    return count
+
+
+def adjust_count(name, delta):
+    try:
+        get_cache().incr(COUNT_KEY.format(name), delta)
+    except ValueError:
+        # ключа нет: его посчитает следующий ``cached_count``
+        pass
+
+
+def forget_count(name):
+    get_cache().delete(COUNT_KEY.format(name))
+
+
+def feed_cache_key(request, feed, *parts):
+    """Ключ фрагмента ленты: тип ленты, версия, позиция и вариант доступа."""
+    variant = _variant(request)
+    position = [f'{name}={request.GET.get(name, "")}'
+                for name in ('page', 'after', 'before')]
+    return ':'.join([feed, *map(str, parts), f'v{feed_version()}',
+                     variant, *position])
+
+
+def feed_cache_context(request, feed, *parts):
+    return {"feed_key": feed_cache_key(request, feed, *parts),
+            "feed_timeout": settings.FEED_CACHE_TIMEOUT,
+            "feed_cache": settings.POSTS_CACHE}
+
+
+def page_etag(request, *args, **kwargs):
+    """ETag страницы без запросов к постам: версия лент, адрес и вариант.
+
+    Версия меняется при любой записи постов, комментариев, групп и
+    подписок, включая удаления, которые не сдвигают ``max(pub_date)``.
+    """
+    resource = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'{feed_version()}-{_variant(request)}-{resource}'
@@ -0,0 +1,158 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в одном файле SQLite, общий для всех процессов на узле.
+
+    В отличие от ``LocMemCache`` его видят все воркеры gunicorn, а
+    ``incr`` выполняется под блокировкой записи SQLite, поэтому счётчики
+    версий (см. ``posts.cache``) увеличиваются атомарно между процессами.
+    """
+    cull_every = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        # соединения SQLite нельзя переносить через fork
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+        connection = sqlite3.connect(self._path, timeout=30,
+                                     isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS cache ('
+                           'key TEXT PRIMARY KEY, '
+                           'value BLOB NOT NULL, '
+                           'expires REAL)')
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+        return connection
+
+    def _expires(self, timeout):
+        # BaseCache уже переводит таймаут в абсолютное время
+        return self.get_backend_timeout(timeout)
+
+    def _alive(self, expires):
+        return expires is None or expires > time.time()
+
+    def _write(self, statements):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = statements(connection)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self._writes += 1
+        if self._writes % self.cull_every == 0:
+            self._cull()
+        return result
+
+    def _cull(self):
+        connection = self._connection()
+        connection.execute('DELETE FROM cache WHERE expires <= ?',
+                           (time.time(),))
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE rowid IN '
+            '(SELECT rowid FROM cache ORDER BY rowid LIMIT ?)',
+            (count // self._cull_frequency,))
+
+    def _row(self, connection, key):
+        row = connection.execute('SELECT value, expires FROM cache '
+                                 'WHERE key = ?', (key,)).fetchone()
+        if row is None or not self._alive(row[1]):
+            return None
+        return row
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        def statements(connection):
+            if self._row(connection, key) is not None:
+                return False
+            connection.execute('REPLACE INTO cache VALUES (?, ?, ?)',
+                               (key, data, self._expires(timeout)))
+            return True
+        return self._write(statements)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._row(self._connection(), key)
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        self._write(lambda connection: connection.execute(
+            'REPLACE INTO cache VALUES (?, ?, ?)',
+            (key, data, self._expires(timeout))))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def statements(connection):
+            if self._row(connection, key) is None:
+                return False
+            connection.execute('UPDATE cache SET expires = ? WHERE key = ?',
+                               (self._expires(timeout), key))
+            return True
+        return self._write(statements)
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(lambda connection: connection.execute(
+            'DELETE FROM cache WHERE key = ?', (key,)))
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._row(self._connection(), key) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def statements(connection):
+            row = self._row(connection, key)
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute('UPDATE cache SET value = ? WHERE key = ?',
+                               (pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                                key))
+            return value
+        return self._write(statements)
+
+    def clear(self):
+        self._write(lambda connection: connection.execute(
+            'DELETE FROM cache'))
+
+    def close(self, **kwargs):
+        # соединение переиспользуется между запросами этого потока
+        pass
@@ -0,0 +1,8 @@
+from django.conf import settings
+
+
+def post_cards(request):
+    """Параметры кэша и картинок карточек для ``posts/post_item.html``."""
+    return {"card_timeout": settings.FEED_CACHE_TIMEOUT,
+            "card_cache": settings.POSTS_CACHE,
+            "thumbnail_sizes": settings.POST_THUMBNAIL_SIZES}
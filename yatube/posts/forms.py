@@ -1,5 +1,6 @@
 from django.forms import ModelForm, Textarea
 
+from .images import EMPTY_METADATA, image_metadata
 from .models import Comment, Post
 
 
@@ -13,6 +14,40 @@ class PostForm(ModelForm):
         help_texts = {'text': 'Введите текст поста',
                       'group': 'Выберите группу'}
 
+    def clean(self):
+        cleaned_data = super().clean()
+        # отклонённая при приёме загрузка пуста, и ошибка самого поля
+        # («файл пуст») не объясняет причину
+        error = getattr(self.files.get('image'), 'upload_error', None)
+        if error:
+            self.errors.pop('image', None)
+            self.add_error('image', error)
+        return cleaned_data
+
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            self._store_image_metadata()
+        return super().save(commit)
+
+    def _store_image_metadata(self):
+        post = self.instance
+        upload = self.cleaned_data.get('image')
+        if not upload:
+            for field, value in EMPTY_METADATA.items():
+                setattr(post, field, value)
+            return
+        for field, value in image_metadata(upload).items():
+            setattr(post, field, value)
+        # такой файл уже загружали: ссылаемся на него вместо копии, а
+        # описание берём у него же — файл мог быть уже перекодирован
+        duplicate = (Post.objects.filter(image_hash=post.image_hash)
+                     .exclude(image='').exclude(pk=post.pk)
+                     .values('image', 'image_width', 'image_height',
+                             'image_size', 'image_mime').first())
+        if duplicate:
+            for field, value in duplicate.items():
+                setattr(post, field, value)
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,99 @@
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+CHUNK_SIZE = 64 * 1024
+# дальше этого заголовок картинки не ищется: решит полная проверка формы
+HEADER_LIMIT = 1024 * 1024
+
+
+def content_hash(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def image_metadata(file):
+    """Размеры, объём, хэш содержимого и MIME-тип картинки.
+
+    У загрузки, прошедшей ``forms.ImageField``, Pillow уже открыл файл:
+    размеры и тип берутся из ``file.image``, без повторного чтения.
+    """
+    image = getattr(file, 'image', None)
+    if image is None:
+        file.seek(0)
+        image = Image.open(file)
+    return {
+        'image_width': image.width,
+        'image_height': image.height,
+        'image_size': file.size,
+        'image_hash': content_hash(file),
+        'image_mime': (getattr(file, 'content_type', None)
+                       or Image.MIME.get(image.format, '')),
+    }
+
+
+EMPTY_METADATA = dict.fromkeys(
+    ('image_width', 'image_height', 'image_size'), None)
+EMPTY_METADATA.update(image_hash='', image_mime='')
+
+
+def header_size(head):
+    """Ширина и высота по началу файла, без декодирования пикселей.
+
+    ``OSError``, если в ``head`` ещё нет полного заголовка.
+    """
+    with Image.open(io.BytesIO(head)) as image:
+        return image.size
+
+
+def size_error(width, height):
+    """Причина отказа для картинки таких размеров или ``None``."""
+    if max(width, height) > settings.IMAGE_MAX_SIDE:
+        return (f'Картинка больше {settings.IMAGE_MAX_SIDE} точек '
+                f'по одной из сторон')
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        return 'В картинке слишком много точек'
+    return None
+
+
+def has_alpha(image):
+    return (image.mode in ('RGBA', 'LA', 'PA')
+            or 'transparency' in image.info)
+
+
+def reencode(file):
+    """Копия картинки без метаданных в экономном формате.
+
+    Фото сохраняются прогрессивным JPEG, картинки с прозрачностью — WebP.
+    Возвращает ``(ContentFile, расширение, новые поля картинки поста)``
+    или ``None`` для анимации, которую перекодирование испортило бы.
+    """
+    with Image.open(file) as image:
+        if getattr(image, 'is_animated', False):
+            return None
+        # поворот из EXIF применяется к пикселям: сами EXIF не сохраняются
+        image = ImageOps.exif_transpose(image)
+        buffer = io.BytesIO()
+        if has_alpha(image):
+            image.convert('RGBA').save(buffer, 'WEBP', method=6,
+                                       quality=settings.IMAGE_QUALITY)
+            extension, mime = 'webp', 'image/webp'
+        else:
+            image.convert('RGB').save(buffer, 'JPEG', optimize=True,
+                                      progressive=True,
+                                      quality=settings.IMAGE_QUALITY)
+            extension, mime = 'jpg', 'image/jpeg'
+        content = ContentFile(buffer.getvalue())
+        return content, extension, {
+            'image_width': image.width,
+            'image_height': image.height,
+            'image_size': content.size,
+            'image_mime': mime,
+        }
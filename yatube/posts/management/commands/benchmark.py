@@ -0,0 +1,241 @@
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_databases, teardown_databases)
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from posts import timeline
+from posts.cache import get_cache
+from posts.models import Comment, Follow, Group, Post, User
+from posts.search import index_post
+
+BATCH = 1000
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (
+        position - lower)
+
+
+def summarize(latencies):
+    return {
+        'requests': len(latencies),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+    }
+
+
+def seed(users, groups, posts, follows, comments):
+    """Наполняет базу: пользователи и группы через mixer, остальное пачками."""
+    authors = mixer.cycle(users).blend(User,
+                                       username=mixer.sequence('user{0}'))
+    groups = mixer.cycle(groups).blend(Group, slug=mixer.sequence('group{0}'))
+    Post.objects.bulk_create(
+        (Post(text=f'Пост номер {i} про книги и фильмы',
+              author=random.choice(authors),
+              group=random.choice(groups + [None]))
+         for i in range(posts)), batch_size=BATCH)
+    pairs = {(random.choice(authors), random.choice(authors))
+             for _ in range(follows)}
+    Follow.objects.bulk_create(
+        (Follow(user=user, author=author)
+         for user, author in pairs if user != author),
+        batch_size=BATCH, ignore_conflicts=True)
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    Comment.objects.bulk_create(
+        (Comment(post_id=random.choice(post_ids),
+                 author=random.choice(authors), text='Комментарий')
+         for _ in range(comments)), batch_size=BATCH)
+    # bulk_create не шлёт сигналы: производные данные строим явно
+    for user_id, author_id in Follow.objects.values_list('user_id',
+                                                         'author_id'):
+        timeline.backfill(user_id, author_id)
+    for post in Post.objects.only('pk', 'text').iterator():
+        index_post(post)
+    call_command('rebuild_counters', stdout=StringIO())
+    return authors
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест основных страниц на тестовой базе: '
+            'задержки p50/p95/p99, запросы к БД и память, вывод в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--follows', type=int, default=500)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=50,
+                            help='запросов на страницу')
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='потоков WSGI-генератора нагрузки')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='файл для JSON-отчёта')
+        parser.add_argument('--compare', help='JSON прошлого прогона')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        directory = tempfile.mkdtemp()
+        # отдельный кэш, чтобы не сбрасывать кэш работающего сайта
+        cache_settings = {**settings.CACHES, settings.POSTS_CACHE: {
+            **settings.CACHES[settings.POSTS_CACHE],
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+        }}
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(CACHES=cache_settings):
+                report = self.run(options)
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            shutil.rmtree(directory, ignore_errors=True)
+        dump = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(dump)
+        else:
+            self.stdout.write(dump)
+        if options['compare']:
+            with open(options['compare']) as previous:
+                self.compare(json.load(previous), report)
+
+    def run(self, options):
+        started = time.monotonic()
+        authors = seed(options['users'], options['groups'], options['posts'],
+                       options['follows'], options['comments'])
+        seeded = time.monotonic() - started
+        reader = max(authors, key=lambda user: user.follower.count())
+        post = Post.objects.filter(comment_count__gt=0).first()
+        group = Group.objects.first()
+        pages = {
+            'index': reverse('index'),
+            'group_posts': reverse('group_posts',
+                                   kwargs={'slug': group.slug}),
+            'profile': reverse('profile',
+                               kwargs={'username': post.author.username}),
+            'post_view': reverse('post', kwargs={
+                'username': post.author.username, 'post_id': post.pk}),
+            'follow_index': reverse('follow_index'),
+        }
+        client = Client()
+        client.force_login(reader)
+        results = {'client': {}, 'wsgi': {}}
+        for name, url in pages.items():
+            results['client'][name] = self.measure_client(
+                client, 'get', url, {}, options['requests'])
+        results['client']['new_post'] = self.measure_client(
+            client, 'post', reverse('new_post'),
+            {'text': 'Новый пост из бенчмарка'}, options['requests'])
+        cookie = f'{settings.SESSION_COOKIE_NAME}=' \
+                 f'{client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        for name, url in pages.items():
+            results['wsgi'][name] = self.measure_wsgi(
+                url, cookie, options['requests'], options['concurrency'])
+        return {
+            'meta': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'cache': settings.CACHES[settings.POSTS_CACHE]['BACKEND'],
+                'volumes': {name: options[name] for name in
+                            ('users', 'groups', 'posts', 'follows',
+                             'comments')},
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'seed_seconds': round(seeded, 2),
+            },
+            'results': results,
+        }
+
+    def measure_client(self, client, method, url, data, count):
+        get_cache().clear()
+        latencies, queries = [], []
+        for _ in range(count):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, method)(url, data)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                raise RuntimeError(f'{url} ответил {response.status_code}')
+            queries.append(len(captured))
+        # память меряется отдельным запросом: tracemalloc искажает задержки
+        get_cache().clear()
+        tracemalloc.start()
+        getattr(client, method)(url, data)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return {**summarize(latencies),
+                'queries_mean': round(sum(queries) / len(queries), 2),
+                'queries_max': max(queries),
+                'peak_memory_kb': round(peak / 1024, 1)}
+
+    def measure_wsgi(self, url, cookie, count, concurrency):
+        """Гоняет WSGI-приложение напрямую из нескольких потоков."""
+        get_cache().clear()
+        application = WSGIHandler()
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def request(_):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': url,
+                'QUERY_STRING': '', 'SERVER_NAME': 'testserver',
+                'SERVER_PORT': '80', 'HTTP_HOST': 'testserver',
+                'HTTP_COOKIE': cookie, 'wsgi.input': BytesIO(),
+                'wsgi.url_scheme': 'http', 'wsgi.errors': BytesIO(),
+            }
+            statuses = []
+            started = time.perf_counter()
+            body = b''.join(application(
+                environ, lambda status, headers: statuses.append(status)))
+            elapsed = (time.perf_counter() - started) * 1000
+            connections.close_all()
+            with lock:
+                latencies.append(elapsed)
+                if int(statuses[0].split()[0]) >= 400:
+                    errors.append(statuses[0])
+            return len(body)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(request, range(count)))
+        wall = time.perf_counter() - started
+        return {**summarize(latencies),
+                'errors': len(errors),
+                'requests_per_second': round(count / wall, 1)}
+
+    def compare(self, previous, current):
+        self.stderr.write('Сравнение p95 с прошлым прогоном:')
+        for driver, pages in current['results'].items():
+            for name, stats in pages.items():
+                before = previous['results'].get(driver, {}).get(name)
+                if not before:
+                    continue
+                change = (stats['p95_ms'] - before['p95_ms']) / max(
+                    before['p95_ms'], 0.001) * 100
+                self.stderr.write(f'  {driver}/{name}: {before["p95_ms"]} → '
+                                  f'{stats["p95_ms"]} мс ({change:+.1f}%)')
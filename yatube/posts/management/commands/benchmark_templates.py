@@ -0,0 +1,95 @@
+import copy
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import (override_settings, setup_databases,
+                               teardown_databases)
+
+from posts.models import Post
+
+from .benchmark import seed, summarize
+
+LOADERS = {
+    'uncached': [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ],
+    'cached': [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ],
+}
+
+
+def templates_with(loaders):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = loaders
+    return templates
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время рендера шаблона главной страницы с '
+            'кэширующим загрузчиком и без него на 10/50/100 постах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,50,100',
+                            help='размеры страницы через запятую')
+        parser.add_argument('--renders', type=int, default=50,
+                            help='рендеров на каждый вариант')
+        parser.add_argument('--output', help='файл для JSON-отчёта')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            seed(users=20, groups=5, posts=max(sizes), follows=0,
+                 comments=max(sizes))
+            posts = list(Post.objects.for_feed()[:max(sizes)])
+            # фрагменты не кэшируются: меряется сам рендер
+            caches = {**settings.CACHES, 'render_benchmark': {
+                'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+            with override_settings(CACHES=caches,
+                                   POSTS_CACHE='render_benchmark'):
+                report = {
+                    name: {str(size): self.measure(loaders, posts, size,
+                                                   options['renders'])
+                           for size in sizes}
+                    for name, loaders in LOADERS.items()}
+        finally:
+            teardown_databases(old_config, verbosity=0)
+        dump = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(dump)
+        else:
+            self.stdout.write(dump)
+        for size in sizes:
+            uncached = report['uncached'][str(size)]['mean_ms']
+            cached = report['cached'][str(size)]['mean_ms']
+            self.stderr.write(f'{size} постов: {uncached} → {cached} мс')
+
+    def measure(self, loaders, posts, size, renders):
+        with override_settings(TEMPLATES=templates_with(loaders)):
+            request = RequestFactory().get('/')
+            request.user = AnonymousUser()
+            page = Paginator(posts, size).page(1)
+            context = {'page': page, 'feed_key': 'render-benchmark',
+                       'feed_timeout': settings.FEED_CACHE_TIMEOUT,
+                       'feed_cache': settings.POSTS_CACHE}
+            # первый рендер наполняет кэш загрузчика, как прогрев
+            render_to_string('posts/index.html', context, request)
+            latencies = []
+            for _ in range(renders):
+                started = time.perf_counter()
+                render_to_string('posts/index.html', context, request)
+                latencies.append((time.perf_counter() - started) * 1000)
+        return summarize(latencies)
@@ -0,0 +1,96 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts.models import Post, StoredFile
+
+
+def walk(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield os.path.join(directory, name)
+    for name in directories:
+        yield from walk(storage, os.path.join(directory, name))
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки, на которые не ссылается ни один пост: '
+            'отпущенные при правке и удалении постов и брошенные загрузки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int,
+                            default=settings.MEDIA_GC_GRACE,
+                            help='не трогать файлы моложе стольких секунд')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        self.storage = Post._meta.get_field('image').storage
+        self.dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        removed = (self.collect_released(cutoff)
+                   + self.collect_untracked(cutoff))
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {removed}'))
+
+    def remove(self, name):
+        self.stdout.write(name)
+        if not self.dry_run:
+            self.storage.delete(name)
+
+    def collect_released(self, cutoff):
+        """Файлы, счётчик ссылок которых давно упал до нуля."""
+        removed = 0
+        orphans = StoredFile.objects.filter(refcount=0, changed__lt=cutoff)
+        for stored in orphans.iterator():
+            # файл удаляется после коммита и только вместе со строкой
+            if self.release_row(orphans, stored):
+                self.remove(stored.name)
+                removed += 1
+        return removed
+
+    def release_row(self, orphans, stored):
+        """Удаляет строку файла, если ссылок на него всё ещё нет."""
+        with transaction.atomic():
+            # до коммита строка заблокирована: параллельная загрузка того
+            # же содержимого ждёт на retain(), а уже увеличенный ею счётчик
+            # исключает строку из выборки
+            locked = (orphans.select_for_update().filter(pk=stored.pk)
+                      .values_list('pk', flat=True).first())
+            if locked is None:
+                return False
+            # счётчик мог разойтись после загрузки в обход сигналов
+            references = Post.objects.filter(image=stored.name).count()
+            if references:
+                StoredFile.objects.filter(pk=stored.pk).update(
+                    refcount=references)
+                return False
+            if self.dry_run:
+                return True
+            deleted, _ = orphans.filter(pk=stored.pk).delete()
+        return deleted > 0
+
+    def referenced(self, name):
+        # файл мог понадобиться загрузке, начатой после снимка ``known``
+        return (StoredFile.objects.filter(name=name).exists()
+                or Post.objects.filter(image=name).exists())
+
+    def collect_untracked(self, cutoff):
+        """Файлы без учёта: загрузки из откатившихся запросов и старые."""
+        upload_to = Post._meta.get_field('image').upload_to
+        if not self.storage.exists(upload_to):
+            return 0
+        known = set(StoredFile.objects.values_list('name', flat=True))
+        known.update(Post.objects.exclude(image='')
+                     .values_list('image', flat=True))
+        removed = 0
+        for name in walk(self.storage, upload_to.rstrip('/')):
+            if (name not in known
+                    and self.storage.get_modified_time(name) < cutoff
+                    and not self.referenced(name)):
+                self.remove(name)
+                removed += 1
+        return removed
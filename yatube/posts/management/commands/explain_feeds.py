@@ -0,0 +1,140 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from posts.models import Comment, Post
+
+ALIAS = 'explain_feeds'
+BATCH = 50000
+
+
+class Command(BaseCommand):
+    help = ('Наполняет отдельную базу SQLite постами и показывает планы '
+            'запросов лент без индексов и с ними.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--path', help='файл базы; по умолчанию '
+                                           'временный и удаляется')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        keep = path is not None
+        if not keep:
+            path = os.path.join(tempfile.mkdtemp(), 'explain.sqlite3')
+        connections.databases[ALIAS] = {
+            **connections.databases['default'],
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path,
+        }
+        try:
+            call_command('migrate', database=ALIAS, verbosity=0)
+            if not Post.objects.using(ALIAS).exists():
+                # без индексов лент и fsync наполнение в разы быстрее
+                self.set_indexes(drop=True)
+                with connections[ALIAS].cursor() as cursor:
+                    cursor.execute('PRAGMA synchronous=OFF')
+                self.seed(options['users'], options['groups'],
+                          options['posts'])
+            self.explain_all('Без индексов лент', drop=True)
+            self.explain_all('С индексами лент', drop=False)
+        finally:
+            connections[ALIAS].close()
+            del connections.databases[ALIAS]
+            if not keep:
+                shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    def seed(self, users, groups, posts):
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+        with transaction.atomic(using=ALIAS), \
+                connections[ALIAS].cursor() as cursor:
+            cursor.executemany(
+                'INSERT INTO auth_user (password, is_superuser, username, '
+                'first_name, last_name, email, is_staff, is_active, '
+                'date_joined) VALUES ("", 0, %s, "", "", "", 0, 1, %s)',
+                [(f'user{i}', now) for i in range(users)])
+            cursor.executemany(
+                'INSERT INTO posts_group (title, slug, description) '
+                'VALUES (%s, %s, "")',
+                [(f'group {i}', f'group-{i}') for i in range(groups)])
+            columns, defaults = self.post_defaults()
+            placeholders = ', '.join(['%s'] * (4 + len(defaults)))
+            insert = (f'INSERT INTO posts_post (text, pub_date, author_id, '
+                      f'group_id, {", ".join(columns)}) '
+                      f'VALUES ({placeholders})')
+            for start in range(0, posts, BATCH):
+                rows = [(f'post {i}', now - timedelta(seconds=i),
+                         random.randint(1, users),
+                         random.choice((None, random.randint(1, groups))),
+                         *defaults)
+                        for i in range(start, min(start + BATCH, posts))]
+                cursor.executemany(insert, rows)
+            cursor.executemany(
+                'INSERT INTO posts_comment (post_id, author_id, text, '
+                'created) VALUES (%s, %s, "comment", %s)',
+                [(random.randint(1, posts), random.randint(1, users),
+                  now - timedelta(seconds=i)) for i in range(posts // 10)])
+        self.stdout.write(f'Наполнено за {time.monotonic() - started:.1f} с')
+
+    def post_defaults(self):
+        """Остальные столбцы поста и их значения по умолчанию.
+
+        Берутся из модели, чтобы новое поле не ломало наполнение.
+        """
+        connection = connections[ALIAS]
+        seeded = {'id', 'text', 'pub_date', 'author', 'group'}
+        fields = [field for field in Post._meta.concrete_fields
+                  if field.name not in seeded]
+        return ([field.column for field in fields],
+                [field.get_db_prep_save(field.get_default(), connection)
+                 for field in fields])
+
+    def set_indexes(self, drop):
+        connection = connections[ALIAS]
+        with connection.schema_editor() as editor:
+            for model in (Post, Comment):
+                existing = connection.introspection.get_constraints(
+                    connection.cursor(), model._meta.db_table)
+                for index in model._meta.indexes:
+                    if drop and index.name in existing:
+                        editor.remove_index(model, index)
+                    elif not drop and index.name not in existing:
+                        editor.add_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def queries(self):
+        posts = Post.objects.using(ALIAS).for_feed()
+        post = posts.first()
+        comments = Comment.objects.using(ALIAS).select_related('author')
+        return {
+            'index': posts[:10],
+            'profile': posts.filter(author_id=post.author_id)[:10],
+            'group_posts': posts.filter(group_id=post.group_id or 1)[:10],
+            'post_view (comments)': comments.filter(post_id=post.pk)[:50],
+        }
+
+    def explain_all(self, title, drop):
+        self.set_indexes(drop)
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        with connections[ALIAS].cursor() as cursor:
+            for name, queryset in self.queries().items():
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = [row[-1] for row in cursor.fetchall()]
+                started = time.monotonic()
+                list(queryset)
+                elapsed = (time.monotonic() - started) * 1000
+                self.stdout.write(f'{name}: {elapsed:.1f} мс')
+                for step in plan:
+                    self.stdout.write(f'    {step}')
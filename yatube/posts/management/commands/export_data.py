@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.transfer import FORMATS, SPECS, export_rows, write_rows
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии или подписки в JSONL '
+            'или CSV потоком, не загружая таблицу в память.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=SPECS)
+        parser.add_argument('--format', choices=FORMATS, default='jsonl')
+        parser.add_argument('--output', help='файл; по умолчанию stdout')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rows = export_rows(options['model'], options['chunk_size'])
+        if options['output']:
+            with open(options['output'], 'w', newline='',
+                      encoding='utf-8') as stream:
+                count = write_rows(stream, options['format'],
+                                   options['model'], rows)
+        else:
+            count = write_rows(self.stdout, options['format'],
+                               options['model'], rows)
+        self.stderr.write(f'Выгружено строк: {count}')
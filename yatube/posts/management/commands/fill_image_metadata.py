@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import image_metadata
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Заполняет размеры, объём, хэш и MIME-тип картинок постов, '
+            'загруженных до появления этих полей.')
+
+    def handle(self, *args, **options):
+        posts = (Post.objects.filter(image_hash='', image__gt='')
+                 .only('pk', 'image'))
+        filled = 0
+        for post in posts.iterator():
+            try:
+                with post.image.open('rb') as file:
+                    metadata = image_metadata(file)
+            except (OSError, SyntaxError) as error:
+                self.stderr.write(f'Пост {post.pk}: {error}')
+                continue
+            Post.objects.filter(pk=post.pk).update(**metadata)
+            filled += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено картинок: {filled}'))
@@ -0,0 +1,54 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from posts.models import Post
+from posts.queue import process_pool
+from posts.routers import pinned_to_primary
+from posts.thumbnails import generate_thumbnail
+
+
+def build(post_id):
+    """Строит набор миниатюр одного поста; возвращает текст ошибки."""
+    close_old_connections()
+    try:
+        with pinned_to_primary():
+            generate_thumbnail(post_id)
+    except Exception as error:
+        return f'Пост {post_id}: {error}'
+    finally:
+        close_old_connections()
+    return None
+
+
+class Command(BaseCommand):
+    help = ('Строит наборы миниатюр для постов, у которых их ещё нет, '
+            'параллельно на всех ядрах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='перестроить все, например после смены '
+                                 'POST_THUMBNAIL_WIDTHS')
+        parser.add_argument('--processes', type=int,
+                            default=os.cpu_count() or 1,
+                            help='размер пула, 0 — в текущем процессе')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.filter(image__gt='')
+        if not options['all']:
+            posts = posts.filter(thumbnail_manifest='')
+        with pinned_to_primary():
+            post_ids = list(posts.values_list('pk', flat=True))
+        if options['processes'] > 0:
+            connections.close_all()
+            with process_pool(options['processes']) as pool:
+                errors = list(pool.map(build, post_ids, chunksize=16))
+        else:
+            errors = [build(post_id) for post_id in post_ids]
+        errors = [error for error in errors if error]
+        for error in errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры построены: {len(post_ids) - len(errors)} '
+            f'из {len(post_ids)}'))
@@ -0,0 +1,67 @@
+import os
+import sys
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.cache import bump_feed_version, forget_count
+from posts.transfer import FORMATS, SPECS, import_rows, read_rows
+
+# производные данные, которые bulk_create не обновляет сигналами
+REBUILDS = {
+    'groups': (),
+    'posts': ('rebuild_counters', 'rebuild_search_index',
+              'rebuild_timelines'),
+    'comments': ('rebuild_counters',),
+    'follows': ('rebuild_counters', 'rebuild_timelines'),
+}
+
+
+def guess_format(path, fmt):
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lstrip('.')
+    return extension if extension in FORMATS else 'jsonl'
+
+
+class Command(BaseCommand):
+    help = ('Загружает группы, посты, комментарии или подписки из JSONL '
+            'или CSV пачками bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=SPECS)
+        parser.add_argument('path', help='файл или «-» для stdin')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='по умолчанию — по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--create-users', action='store_true',
+                            help='создавать неизвестных пользователей '
+                                 'без пароля')
+        parser.add_argument('--no-rebuild', action='store_true',
+                            help='не пересчитывать счётчики, ленты и '
+                                 'поиск; запустите их после последнего '
+                                 'файла')
+
+    def handle(self, *args, **options):
+        model, path = options['model'], options['path']
+        fmt = guess_format(path, options['format'])
+        if path == '-':
+            read, written = self.load(sys.stdin, fmt, options)
+        else:
+            try:
+                stream = open(path, newline='', encoding='utf-8')
+            except OSError as error:
+                raise CommandError(error)
+            with stream:
+                read, written = self.load(stream, fmt, options)
+        if not options['no_rebuild']:
+            for command in REBUILDS[model]:
+                call_command(command, stdout=self.stdout)
+        bump_feed_version()
+        forget_count('all')
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано строк: {read}, передано в базу: {written}'))
+
+    def load(self, stream, fmt, options):
+        return import_rows(options['model'], read_rows(stream, fmt),
+                           options['batch_size'], options['create_users'])
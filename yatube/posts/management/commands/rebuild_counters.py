@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from posts.models import AuthorStats, Comment, Follow, Post, StoredFile, User
+
+
+def count_by(queryset, field):
+    return Coalesce(Subquery(queryset.filter(**{field: OuterRef('pk')})
+                             .order_by().values(field)
+                             .annotate(total=Count('pk'))
+                             .values('total')), Value(0))
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики постов, подписок и '
+            'ссылок на картинки.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            Post.objects.update(
+                comment_count=count_by(Comment.objects, 'post'))
+            users = User.objects.annotate(
+                posts_total=count_by(Post.objects, 'author'),
+                followers_total=count_by(Follow.objects, 'author'),
+                following_total=count_by(Follow.objects, 'user'),
+            ).values_list('pk', 'posts_total', 'followers_total',
+                          'following_total')
+            AuthorStats.objects.all().delete()
+            AuthorStats.objects.bulk_create(
+                (AuthorStats(user_id=pk, post_count=posts,
+                             follower_count=followers,
+                             following_count=following)
+                 for pk, posts, followers, following in users.iterator()),
+                batch_size=1000)
+            self.count_images()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
+
+    def count_images(self):
+        images = (Post.objects.exclude(image='').exclude(image=None)
+                  .order_by().values('image').annotate(total=Count('pk'))
+                  .values_list('image', 'total'))
+        # файлы без ссылок остаются с нулём: их удалит collect_media
+        StoredFile.objects.update(refcount=0)
+        for name, total in images.iterator():
+            updated = StoredFile.objects.filter(name=name).update(
+                refcount=total)
+            if not updated:
+                StoredFile.objects.create(name=name, refcount=total)
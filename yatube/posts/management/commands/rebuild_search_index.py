@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.search import index_post
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов.'
+
+    def handle(self, *args, **options):
+        for post in Post.objects.only('pk', 'text').iterator():
+            index_post(post)
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
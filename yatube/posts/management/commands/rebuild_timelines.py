@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Дозаполняет домашние ленты по всем подпискам.'
+
+    def handle(self, *args, **options):
+        follows = (Follow.objects.filter(user__isnull=False,
+                                         author__isnull=False)
+                   .values_list('user_id', 'author_id'))
+        for user_id, author_id in follows.iterator():
+            timeline.backfill(user_id, author_id)
+        self.stdout.write(self.style.SUCCESS('Ленты перестроены'))
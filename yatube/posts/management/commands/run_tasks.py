@@ -0,0 +1,57 @@
+import os
+import time
+from concurrent.futures import wait
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.queue import (claim, process_pool, release_stale, run_in_worker,
+                         run_task)
+from posts.routers import pinned_to_primary
+
+
+class Command(BaseCommand):
+    help = ('Выполняет задачи из очереди: миниатюры, раздачу постов в '
+            'ленты, поисковый индекс.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int,
+                            default=os.cpu_count() or 1,
+                            help='размер пула, 0 — в текущем процессе')
+        parser.add_argument('--batch', type=int, default=20,
+                            help='сколько задач забирать за раз')
+        parser.add_argument('--poll', type=float, default=1.0,
+                            help='пауза в секундах, когда очередь пуста')
+        parser.add_argument('--once', action='store_true',
+                            help='выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        with pinned_to_primary():
+            if options['processes'] > 0:
+                with process_pool(options['processes']) as pool:
+                    done = self.loop(options, pool)
+            else:
+                done = self.loop(options)
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
+
+    def loop(self, options, pool=None):
+        done = 0
+        while True:
+            release_stale()
+            claimed = claim(options['batch'])
+            if not claimed:
+                if options['once']:
+                    return done
+                time.sleep(options['poll'])
+                continue
+            if pool is None:
+                for pk in claimed:
+                    run_task(pk)
+            else:
+                # дочерние процессы не должны наследовать открытые
+                # соединения: каждый откроет своё
+                connections.close_all()
+                futures = [pool.submit(run_in_worker, pk) for pk in claimed]
+                for future in wait(futures).done:
+                    future.result()
+            done += len(claimed)
@@ -0,0 +1,23 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик: локальная '
+            'замена репликации для проверки маршрутизации чтения.')
+
+    def handle(self, *args, **options):
+        primary = connections.databases['default']
+        if not primary['ENGINE'].endswith('sqlite3'):
+            raise CommandError('Реплики PostgreSQL наполняет сама СУБД')
+        with sqlite3.connect(primary['NAME']) as source:
+            for alias in settings.DATABASE_REPLICAS:
+                target = sqlite3.connect(connections.databases[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'{alias}: скопирована')
@@ -0,0 +1,267 @@
+import json
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+# границы корзин гистограмм: секунды для времени, штуки для запросов
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+SERIES = {
+    'duration_seconds': TIME_BUCKETS,
+    'sql_seconds': TIME_BUCKETS,
+    'template_seconds': TIME_BUCKETS,
+    'thumbnail_seconds': TIME_BUCKETS,
+    'queries': COUNT_BUCKETS,
+    'duplicate_queries': COUNT_BUCKETS,
+}
+
+_local = threading.local()
+
+
+class Sample:
+    """Замеры одного запроса или одной фоновой задачи."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.timings = Counter()
+        self.statements = Counter()
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicate_queries(self):
+        """Повторы одного и того же SQL с разными параметрами — N+1."""
+        return sum(count - 1 for count in self.statements.values()
+                   if count > 1)
+
+    def finish(self):
+        return {
+            'duration_seconds': time.perf_counter() - self.started,
+            'sql_seconds': self.timings['sql'],
+            'template_seconds': self.timings['template'],
+            'thumbnail_seconds': self.timings['thumbnail'],
+            'queries': self.queries,
+            'duplicate_queries': self.duplicate_queries,
+        }
+
+
+def _empty_totals():
+    return {series: {'count': 0, 'sum': 0,
+                     'buckets': dict.fromkeys(map(str, bounds), 0)}
+            for series, bounds in SERIES.items()}
+
+
+class Registry:
+    """Замеры по каждому представлению: скользящее окно и итоги.
+
+    Окно последних замеров показывает текущее состояние (JSON), а
+    накопительные гистограммы только растут, как того ждёт Prometheus.
+    Данные живут в памяти процесса: каждый воркер отдаёт свои.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._totals = defaultdict(_empty_totals)
+
+    def observe(self, name, values):
+        with self._lock:
+            self._samples[name].append(values)
+            totals = self._totals[name]
+            for series, bounds in SERIES.items():
+                histogram = totals[series]
+                histogram['count'] += 1
+                histogram['sum'] += values[series]
+                for bound in bounds:
+                    if values[series] <= bound:
+                        histogram['buckets'][str(bound)] += 1
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+    def totals(self):
+        """Накопительные гистограммы с запуска процесса."""
+        with self._lock:
+            return {name: {series: {**histogram,
+                                    'buckets': dict(histogram['buckets'])}
+                           for series, histogram in totals.items()}
+                    for name, totals in sorted(self._totals.items())}
+
+    def snapshot(self):
+        with self._lock:
+            samples = {name: list(values)
+                       for name, values in self._samples.items()}
+        return {name: self._histograms(values)
+                for name, values in sorted(samples.items())}
+
+    def _histograms(self, samples):
+        result = {}
+        for series, bounds in SERIES.items():
+            values = sorted(sample[series] for sample in samples)
+            result[series] = {
+                'count': len(values),
+                'sum': sum(values),
+                'buckets': {str(bound): bisect_right(values, bound)
+                            for bound in bounds},
+                'max': values[-1] if values else 0,
+            }
+        return result
+
+
+registry = Registry(getattr(settings, 'METRICS_WINDOW', 1000))
+
+
+def current():
+    return getattr(_local, 'sample', None)
+
+
+@contextmanager
+def collect(name):
+    """Собирает замеры блока кода и кладёт их в реестр под ``name``."""
+    outer = current()
+    sample = _local.sample = Sample(name)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_record_sql))
+            yield sample
+    finally:
+        _local.sample = outer
+        registry.observe(sample.name, sample.finish())
+
+
+@contextmanager
+def timed(kind):
+    """Добавляет длительность блока к текущему замеру, если он идёт."""
+    sample = current()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if sample is not None:
+            sample.timings[kind] += time.perf_counter() - started
+
+
+def _record_sql(execute, sql, params, many, context):
+    sample = current()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.timings['sql'] += time.perf_counter() - started
+        sample.statements[sql] += 1
+
+
+class TimedTemplate:
+    """Шаблон, время отрисовки которого добавляется к текущему замеру."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        # шаблон, отрисованный внутри другого, уже учтён во внешнем
+        if getattr(_local, 'rendering', False):
+            return self.template.render(context, request)
+        _local.rendering = True
+        try:
+            with timed('template'):
+                return self.template.render(context, request)
+        finally:
+            _local.rendering = False
+
+
+class TimedTemplates(DjangoTemplates):
+    """Движок Django, отдающий шаблоны с замером времени.
+
+    Замеряются только шаблоны этого движка, а вложенные ``include`` и
+    ``extends`` входят во время внешнего шаблона.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match._func_path
+
+
+class MetricsMiddleware:
+    """Считает запросы к БД, их повторы и время SQL, шаблонов и миниатюр.
+
+    В режиме DEBUG итог запроса виден в заголовке ``Server-Timing``.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect('unresolved') as sample:
+            response = self.get_response(request)
+            sample.name = view_name(request)
+        if settings.DEBUG:
+            response['Server-Timing'] = server_timing(sample)
+        return response
+
+
+def server_timing(sample):
+    values = sample.finish()
+    parts = [f'{kind};dur={values[f"{kind}_seconds"] * 1000:.1f}'
+             for kind in ('sql', 'template', 'thumbnail')]
+    parts.append(f'queries;desc="{values["queries"]} queries, '
+                 f'{values["duplicate_queries"]} duplicates"')
+    return ', '.join(parts)
+
+
+def to_json(snapshot):
+    return json.dumps(snapshot, indent=2)
+
+
+def to_prometheus(totals):
+    """Текстовый формат Prometheus: по гистограмме на серию.
+
+    ``totals`` — накопительные гистограммы (``Registry.totals``): счётчики
+    корзин не уменьшаются, и ``rate()`` по ним считается верно.
+    """
+    lines = []
+    for series, bounds in SERIES.items():
+        metric = f'yatube_view_{series}'
+        lines.append(f'# TYPE {metric} histogram')
+        for view, histograms in totals.items():
+            histogram = histograms[series]
+            label = f'view="{view}"'
+            for bound in bounds:
+                count = histogram['buckets'][str(bound)]
+                lines.append(f'{metric}_bucket{{{label},le="{bound}"}} '
+                             f'{count}')
+            lines.append(f'{metric}_bucket{{{label},le="+Inf"}} '
+                         f'{histogram["count"]}')
+            lines.append(f'{metric}_sum{{{label}}} {histogram["sum"]}')
+            lines.append(f'{metric}_count{{{label}}} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_manifest',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 2.2.6 on 2026-10-18 18:32
+
+from django.db import migrations, models
+import django.utils.timezone
+from django.db.models import Count
+import posts.storage
+
+
+def count_references(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    StoredFile = apps.get_model('posts', 'StoredFile')
+    images = (Post.objects.exclude(image='').exclude(image__isnull=True)
+              .order_by().values('image').annotate(total=Count('pk')))
+    StoredFile.objects.bulk_create(
+        (StoredFile(name=row['image'], refcount=row['total'])
+         for row in images.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_thumbnail_manifest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('changed', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Файл',
+                'verbose_name_plural': 'Файлы',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/'),
+        ),
+        migrations.AddIndex(
+            model_name='storedfile',
+            index=models.Index(fields=['refcount', 'changed'], name='stored_file_orphan_idx'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
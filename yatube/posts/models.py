@@ -1,5 +1,11 @@
+import json
+import os
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -17,6 +23,17 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Всё, что нужно карточке поста, одним запросом."""
+        return (self.select_related('author', 'group')
+                .order_by('-pub_date', '-id'))
+
+    def bump_card_version(self, **changes):
+        return self.update(card_version=models.F('card_version') + 1,
+                           **changes)
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField("date published", auto_now_add=True)
@@ -25,18 +42,52 @@ class Post(models.Model):
     group = models.ForeignKey(Group, on_delete=models.SET_NULL,
                               blank=True, null=True, related_name="posts")
 
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    image = models.ImageField(upload_to='posts/', blank=True, null=True,
+                              storage=ContentAddressedStorage())
+    # снимаются один раз при загрузке, чтобы не открывать файл при рендере
+    image_width = models.PositiveIntegerField(null=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, editable=False)
+    image_size = models.PositiveIntegerField(null=True, editable=False)
+    image_hash = models.CharField(max_length=64, blank=True, db_index=True,
+                                  editable=False)
+    image_mime = models.CharField(max_length=50, blank=True, editable=False)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    thumbnail_url = models.CharField(max_length=255, blank=True,
+                                     editable=False)
+    thumbnail_width = models.PositiveIntegerField(null=True, editable=False)
+    thumbnail_height = models.PositiveIntegerField(null=True, editable=False)
+    # все ширины миниатюры для srcset: JSON [{"width", "height", "url"}]
+    thumbnail_manifest = models.TextField(blank=True, default='',
+                                          editable=False)
+    # версия кэшированной карточки: растёт при правке, комментарии и
+    # новой миниатюре
+    card_version = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_feed_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_feed_idx'),
+        ]
 
     def __str__(self):
         return self.text
 
+    @property
+    def thumbnails(self):
+        if not self.thumbnail_manifest:
+            return []
+        return json.loads(self.thumbnail_manifest)
+
     def get_name_image(self):
-        return self.image.name.split('/')[1].split('_')[0]
+        return os.path.splitext(os.path.basename(self.image.name))[0]
 
 
 class Comment(models.Model):
@@ -49,6 +100,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ["-created"]
+        indexes = [
+            models.Index(fields=['post', '-created'],
+                         name='comment_post_created_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -61,3 +116,154 @@ class Follow(models.Model):
     class Meta:
         constraints = [models.UniqueConstraint(fields=['user', 'author'],
                                                name='unique_follow')]
+
+
+class AuthorStatsManager(models.Manager):
+    def refresh(self, user_id):
+        """Пересчитывает счётчики пользователя по исходным таблицам."""
+        stats, _ = self.update_or_create(
+            user_id=user_id,
+            defaults={
+                'post_count': Post.objects.filter(author_id=user_id).count(),
+                'follower_count': Follow.objects.filter(
+                    author_id=user_id).count(),
+                'following_count': Follow.objects.filter(
+                    user_id=user_id).count(),
+            })
+        return stats
+
+    def for_user(self, user):
+        try:
+            return self.get(user=user)
+        except self.model.DoesNotExist:
+            return self.refresh(user.pk)
+
+    def bump(self, user_id, field, delta):
+        if user_id is None:
+            return
+        updated = self.filter(user_id=user_id).update(
+            **{field: models.F(field) + delta})
+        # при удалении строку не создаём: пользователь может удаляться
+        # каскадом, а for_user всё равно посчитает её заново
+        if not updated and delta > 0:
+            self.refresh(user_id)
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики для профиля и карточки автора."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name="stats")
+    post_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    objects = AuthorStatsManager()
+
+    class Meta:
+        verbose_name = "Статистика автора"
+        verbose_name_plural = "Статистика авторов"
+
+
+class TimelineEntry(models.Model):
+    """Пост в домашней ленте подписчика, записанный при публикации."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name="timeline")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="timeline_entries")
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'post'],
+                                               name='unique_timeline_entry')]
+
+
+class SearchEntry(models.Model):
+    """Запись инвертированного индекса: терм и его частота в посте."""
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="search_entries")
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['term', 'post'],
+                                               name='unique_search_entry')]
+
+
+class Task(models.Model):
+    """Отложенный вызов функции, который выполняет команда ``run_tasks``.
+
+    ``key`` склеивает одинаковые вызовы: пока задача ждёт в очереди,
+    вторая такая же не добавляется.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = ((PENDING, 'в очереди'), (RUNNING, 'выполняется'),
+                (FAILED, 'не выполнена'))
+
+    name = models.CharField(max_length=200)
+    args = models.TextField(default='[]')
+    key = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Задача"
+        verbose_name_plural = "Задачи"
+        indexes = [models.Index(fields=['status', 'run_at'],
+                                name='task_status_run_at_idx')]
+        constraints = [models.UniqueConstraint(
+            fields=['key'], condition=models.Q(status='pending'),
+            name='unique_pending_task')]
+
+    def __str__(self):
+        return self.key
+
+
+class StoredFileManager(models.Manager):
+    def retain(self, name):
+        if not name:
+            return
+        changes = {'refcount': models.F('refcount') + 1,
+                   'changed': timezone.now()}
+        if self.filter(name=name).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                self.create(name=name, refcount=1)
+        except IntegrityError:
+            # строку только что создал параллельный запрос
+            self.filter(name=name).update(**changes)
+
+    def release(self, name):
+        if not name:
+            return
+        self.filter(name=name, refcount__gt=0).update(
+            refcount=models.F('refcount') - 1, changed=timezone.now())
+
+
+class StoredFile(models.Model):
+    """Файл картинки в хранилище и число постов, которые на него ссылаются.
+
+    Файл без ссылок удаляется не сразу, а командой ``collect_media``:
+    транзакция, отпустившая его, ещё может откатиться.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    changed = models.DateTimeField(default=timezone.now)
+
+    objects = StoredFileManager()
+
+    class Meta:
+        verbose_name = "Файл"
+        verbose_name_plural = "Файлы"
+        indexes = [models.Index(fields=['refcount', 'changed'],
+                                name='stored_file_orphan_idx')]
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,283 @@
+import base64
+import binascii
+import datetime
+import json
+from math import ceil
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import (EmptyPage, InvalidPage, Page,
+                                   PageNotAnInteger, Paginator)
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder обрезает микросекунды, а курсору нужна точность
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage(Page):
+    """Страница, построенная по курсору, а не по номеру.
+
+    Не знает ни номера, ни общего количества страниц, поэтому не
+    обращается к ``paginator.count``.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        super().__init__(object_list, 1, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    # номеров у курсорной страницы нет: вместо них — курсоры соседних
+    # страниц, а индексы считаются в пределах самой страницы
+
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+    def start_index(self):
+        return 1 if self.object_list else 0
+
+    def end_index(self):
+        return len(self.object_list)
+
+
+class CursorStream:
+    """Итератор по строкам страницы; курсоры известны после обхода.
+
+    Страница вперёд не держится в памяти целиком, страница назад
+    (``before``) читается в обратном порядке и потому буферизуется.
+    """
+
+    def __init__(self, paginator, queryset, after=None, before=None):
+        self.paginator = paginator
+        self.queryset = queryset
+        self.after = after
+        self.before = before
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    def __iter__(self):
+        per_page = self.paginator.per_page
+        rows = self.queryset.iterator()
+        if self.before:
+            rows = list(rows)
+            has_more = len(rows) > per_page
+            rows = reversed(rows[:per_page])
+        first = last = None
+        count = 0
+        for row in rows:
+            count += 1
+            if count > per_page:
+                break
+            if first is None:
+                first = row
+            last = row
+            yield row
+        if not self.before:
+            has_more = count > per_page
+        if first is None:
+            return
+        if has_more or self.before:
+            self.next_cursor = self.paginator.encode_cursor(last)
+        if (has_more and self.before) or self.after:
+            self.previous_cursor = self.paginator.encode_cursor(first)
+
+
+class CursorPaginator(Paginator):
+    """Keyset-паджинатор: страницы выбираются условием по ключу сортировки.
+
+    ``ordering`` — уникальный набор полей (последнее — первичный ключ),
+    например ``('-pub_date', '-id')``. Стоимость любой страницы равна
+    стоимости первой: нет ни ``COUNT(*)``, ни ``OFFSET``.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id'),
+                 **kwargs):
+        super().__init__(object_list.order_by(*ordering), per_page, **kwargs)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, obj):
+        # строки из values() — словари, объекты моделей — через атрибуты
+        if isinstance(obj, dict):
+            values = [obj[name] for name in self.fields]
+        else:
+            values = [getattr(obj, name) for name in self.fields]
+        raw = json.dumps(values, cls=CursorEncoder).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        padding = '=' * (-len(cursor) % 4)
+        try:
+            raw = base64.urlsafe_b64decode(cursor + padding)
+            values = json.loads(raw.decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        opts = self.object_list.model._meta
+        result = []
+        for name, value in zip(self.fields, values):
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                result.append(value)
+                continue
+            try:
+                result.append(field.to_python(value))
+            except ValidationError:
+                raise InvalidCursor(cursor)
+        return result
+
+    def _seek(self, values, forward):
+        """Условие «строго после» (или «строго до») ключа ``values``."""
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith('-')
+            field = name.lstrip('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{field}__{lookup}': values[position]})
+            for previous in range(position):
+                step &= Q(**{self.fields[previous]: values[previous]})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else '-' + name
+                for name in self.ordering]
+
+    def cursor_stream(self, after=None, before=None):
+        """Страница по курсору, читаемая по мере итерации."""
+        queryset = self.object_list
+        if before:
+            values = self.decode_cursor(before)
+            queryset = queryset.filter(self._seek(values, forward=False))
+            queryset = queryset.order_by(*self._reversed_ordering())
+        elif after:
+            values = self.decode_cursor(after)
+            queryset = queryset.filter(self._seek(values, forward=True))
+        return CursorStream(self, queryset[:self.per_page + 1],
+                            after=after, before=before)
+
+    def cursor_page(self, after=None, before=None):
+        stream = self.cursor_stream(after=after, before=before)
+        items = list(stream)
+        return CursorPage(items, self, stream.next_cursor,
+                          stream.previous_cursor)
+
+    def get_cursor_page(self, after=None, before=None):
+        """Как ``cursor_page``, но испорченный курсор даёт первую страницу."""
+        try:
+            return self.cursor_page(after=after, before=before)
+        except InvalidCursor:
+            return self.cursor_page()
+
+
+class CountedPaginator(Paginator):
+    """Паджинатор без ``COUNT(*)``: количество берётся из кэша или счётчика.
+
+    ``count`` — число или функция без аргументов. Оценка может отставать,
+    поэтому она сверяется с базой одним запросом ``LIMIT 1`` сразу за
+    текущей страницей: следующая страница есть ровно тогда, когда есть
+    следующий пост, а лишние страницы в конце не показываются.
+
+    Пустую страницу за концом ленты ``page`` отклоняет (``EmptyPage``), а
+    ``get_page`` заменяет последней — только здесь нужен ``COUNT(*)``.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._estimate = count
+        self._bottom = 0
+        self._has_next = None
+
+    def validate_number(self, number):
+        # верхнюю границу по оценке не проверяем: она могла устареть
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        self._has_next = None
+        if number > 1:
+            # ключи страницы и первого поста следующей: тот же запрос
+            # заменяет проверку в ``count``
+            keys = self.object_list[bottom:top + 1].values('pk')
+            if not keys:
+                raise EmptyPage('That page contains no results')
+            self._has_next = len(keys) > self.per_page
+        self._bottom = bottom
+        return self._get_page(self.object_list[bottom:top], number, self)
+
+    def get_page(self, number):
+        try:
+            number = self.validate_number(number)
+        except InvalidPage:
+            number = 1
+        try:
+            return self.page(number)
+        except EmptyPage:
+            total = self.object_list.count()
+            return self.page(max(ceil(total / self.per_page), 1))
+
+    @cached_property
+    def count(self):
+        estimate = self._estimate
+        if callable(estimate):
+            estimate = estimate()
+        top = self._bottom + self.per_page
+        has_next = self._has_next
+        if has_next is None:
+            has_next = bool(self.object_list[top:top + 1].values('pk'))
+        if has_next:
+            return max(estimate, top + 1)
+        return max(min(estimate, top), self._bottom + 1 if self._bottom else 0)
+
+
+def page_window(page, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей и по краям; ``None`` — пропуск."""
+    last = page.paginator.num_pages
+    shown = set(range(1, min(on_ends, last) + 1))
+    shown.update(range(max(last - on_ends + 1, 1), last + 1))
+    shown.update(range(max(page.number - on_each_side, 1),
+                       min(page.number + on_each_side, last) + 1))
+    previous = 0
+    for number in sorted(shown):
+        if number > previous + 1:
+            yield None
+        yield number
+        previous = number
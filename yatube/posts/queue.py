@@ -0,0 +1,132 @@
+"""Очередь фоновых задач в таблице ``Task``.
+
+Задача — вызов функции по её пути импорта с аргументами в JSON. Строка
+пишется в той же транзакции, что и изменение, которое её породило, так
+что откат отменяет и задачу. Воркер (``manage.py run_tasks``) забирает
+задачи условным ``UPDATE``: это работает на любой базе и не даёт двум
+воркерам взять одну задачу.
+"""
+import json
+import logging
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+from .routers import pinned_to_primary
+
+logger = logging.getLogger(__name__)
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def task_key(name, args):
+    return f'{name}:{json.dumps(args)}'[:255]
+
+
+def enqueue(func, *args, delay=0, max_attempts=None):
+    """Ставит ``func(*args)`` в очередь; повтор ждущей задачи не добавляется.
+
+    Повтор с ``delay`` откладывает ждущую задачу: задержка отсчитывается
+    от последнего вызова.
+
+    При ``TASKS_EAGER`` функция выполняется сразу — так работают
+    разработка и тесты, где воркера нет. Ошибка задачи здесь не глушится,
+    а ломает запрос, чтобы её было видно. Отложенная задача и тогда ждёт
+    воркера: выполнить её раньше срока значит потерять смысл задержки.
+    """
+    if settings.TASKS_EAGER and not delay:
+        func(*args)
+        return
+    name = task_name(func)
+    args = list(args)
+    key = task_key(name, args)
+    run_at = timezone.now() + timedelta(seconds=delay)
+    Task.objects.bulk_create([Task(
+        name=name, args=json.dumps(args), key=key,
+        max_attempts=max_attempts or settings.TASKS_MAX_ATTEMPTS,
+        run_at=run_at)], ignore_conflicts=True)
+    if delay:
+        Task.objects.filter(key=key, status=Task.PENDING,
+                            run_at__lt=run_at).update(run_at=run_at)
+
+
+def release_stale():
+    """Возвращает в очередь задачи воркеров, которые упали на полпути."""
+    expired = timezone.now() - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    for task in Task.objects.filter(status=Task.RUNNING,
+                                    locked_at__lt=expired):
+        _retry_or_fail(task, 'Истекла блокировка воркера')
+
+
+def claim(limit):
+    """Забирает до ``limit`` готовых задач и возвращает их id."""
+    now = timezone.now()
+    ready = (Task.objects.filter(status=Task.PENDING, run_at__lte=now)
+             .order_by('run_at', 'id').values_list('id', flat=True)[:limit])
+    return [pk for pk in ready
+            if Task.objects.filter(pk=pk, status=Task.PENDING).update(
+                status=Task.RUNNING, locked_at=now)]
+
+
+def _retry_or_fail(task, error):
+    task.attempts += 1
+    task.last_error = error
+    task.locked_at = None
+    if task.attempts >= task.max_attempts:
+        logger.error('Task %s failed after %s attempts', task.key,
+                     task.attempts)
+        task.status = Task.FAILED
+        task.save()
+        return
+    task.status = Task.PENDING
+    # задержка удваивается с каждой попыткой
+    task.run_at = timezone.now() + timedelta(
+        seconds=settings.TASKS_RETRY_DELAY * 2 ** (task.attempts - 1))
+    try:
+        with transaction.atomic():
+            task.save()
+    except IntegrityError:
+        # пока задача выполнялась, такую же поставили заново
+        task.delete()
+
+
+def run_task(pk):
+    """Выполняет взятую задачу; успешная удаляется, упавшая повторяется."""
+    with pinned_to_primary():
+        task = Task.objects.filter(pk=pk, status=Task.RUNNING).first()
+        if task is None:
+            return
+        try:
+            import_string(task.name)(*json.loads(task.args))
+        except Exception:
+            logger.exception('Task %s raised', task.key)
+            _retry_or_fail(task, traceback.format_exc())
+            return
+        task.delete()
+
+
+def process_pool(processes):
+    """Пул процессов для работы с базой.
+
+    При запуске через spawn дочерний процесс сам настраивает Django.
+    Перед отправкой задач закрывайте соединения
+    (``connections.close_all()``), чтобы их не унаследовали при fork.
+    """
+    return ProcessPoolExecutor(processes, initializer=django.setup)
+
+
+def run_in_worker(pk):
+    close_old_connections()
+    try:
+        run_task(pk)
+    finally:
+        close_old_connections()
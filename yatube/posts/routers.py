@@ -0,0 +1,97 @@
+import random
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = 'default'
+# сессии и пользователи нужны сразу после входа и регистрации
+PRIMARY_APPS = {'sessions', 'auth'}
+
+_state = threading.local()
+
+
+def _same_database(alias):
+    # зеркало в тестах указывает на ту же базу, что и основная
+    primary = connections.databases[PRIMARY]
+    replica = connections.databases[alias]
+    return all(replica.get(key) == primary.get(key)
+               for key in ('ENGINE', 'NAME', 'HOST', 'PORT'))
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASE_REPLICAS
+            if not _same_database(alias)]
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', 0) > 0
+
+
+class pinned_to_primary:
+    """Внутри блока все чтения идут в основную базу."""
+
+    def __enter__(self):
+        _state.pinned = getattr(_state, 'pinned', 0) + 1
+
+    def __exit__(self, *exc_info):
+        _state.pinned -= 1
+
+
+class ReplicaRouter:
+    """Чтение — из случайной реплики, запись — в основную базу.
+
+    Чтение уходит в основную базу, если реплик нет, запрос изменяющий
+    или пользователь недавно писал (см. ``PrimaryStickinessMiddleware``).
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if (not replicas or is_pinned()
+                or model._meta.app_label in PRIMARY_APPS):
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики хранят те же строки, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+def use_primary(view):
+    """Представление читает из основной базы, а после записи пользователь
+    ещё ``REPLICA_LAG`` секунд читает оттуда же свои изменения."""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        _state.wrote = False
+        with pinned_to_primary():
+            response = view(request, *args, **kwargs)
+        if _state.wrote:
+            response.set_cookie(settings.REPLICA_STICKY_COOKIE, '1',
+                                max_age=settings.REPLICA_LAG,
+                                httponly=True, samesite='Lax')
+        return response
+    return wrapper
+
+
+class PrimaryStickinessMiddleware:
+    """Закрепляет запрос за основной базой по cookie недавней записи и
+    для изменяющих методов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (request.method not in ('GET', 'HEAD', 'OPTIONS')
+                or settings.REPLICA_STICKY_COOKIE in request.COOKIES):
+            with pinned_to_primary():
+                return self.get_response(request)
+        return self.get_response(request)
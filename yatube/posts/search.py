@@ -0,0 +1,170 @@
+import math
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+
+from .models import Post, SearchEntry
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+STOP_WORDS = frozenset(
+    'и в во не что он на я с со как а то все она так его но да ты к у же '
+    'вы за бы по только ее мне было вот от меня еще нет о из ему теперь '
+    'когда даже ну вдруг ли если уже или ни быть был него до вас нибудь '
+    'опять уж вам ведь там потом себя ничего ей может они тут где есть '
+    'надо ней для мы тебя их чем была сам чтоб без будто чего раз тоже '
+    'себе под будет ж тогда кто этот того потому этого какой совсем ним '
+    'здесь этом один почти мой тем чтобы нее были куда зачем всех никогда '
+    'можно при наконец два об другой хоть после над больше тот через эти '
+    'нас про всего них какая много разве три эту моя впрочем хорошо свою '
+    'этой перед иногда лучше чуть том нельзя такой им более всегда конечно '
+    'всю между'.split())
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'),
+                     ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой',
+             'ем', 'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых',
+             'ую', 'юю', 'ая', 'яя', 'ою', 'ею')
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ('ся', 'сь')
+VERB = (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+         'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+        ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+         'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+         'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'))
+NOUN = ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+        'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+        'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+        'ья', 'я')
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _region(word):
+    """Часть слова после первой пары «гласная, согласная»."""
+    for i in range(1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word, endings, after_a=False):
+    for ending in sorted(endings, key=len, reverse=True):
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if after_a and not stem.endswith(('а', 'я')):
+            continue
+        return stem
+    return None
+
+
+def _strip_grouped(word, groups):
+    stripped = _strip(word, groups[0], after_a=True)
+    if stripped is None:
+        stripped = _strip(word, groups[1])
+    return stripped
+
+
+def _inflection(rv):
+    """Шаг 1: деепричастие или возвратная частица и окончание."""
+    gerund = _strip_grouped(rv, PERFECTIVE_GERUND)
+    if gerund is not None:
+        return gerund
+    reflexive = _strip(rv, REFLEXIVE)
+    if reflexive is not None:
+        rv = reflexive
+    adjective = _strip(rv, ADJECTIVE)
+    if adjective is not None:
+        participle = _strip_grouped(adjective, PARTICIPLE)
+        return adjective if participle is None else participle
+    for stripped in (_strip_grouped(rv, VERB), _strip(rv, NOUN)):
+        if stripped is not None:
+            return stripped
+    return rv
+
+
+def _tidy(rv):
+    """Шаг 4: удвоенная «н», превосходная степень, мягкий знак."""
+    if rv.endswith('нн'):
+        return rv[:-1]
+    superlative = _strip(rv, SUPERLATIVE)
+    if superlative is not None:
+        return superlative[:-1] if superlative.endswith('нн') else superlative
+    if rv.endswith('ь'):
+        return rv[:-1]
+    return rv
+
+
+def stem(word):
+    """Стеммер Snowball для русского языка."""
+    word = word.lower().replace('ё', 'е')
+    for i, letter in enumerate(word):
+        if letter in VOWELS:
+            prefix, rv = word[:i + 1], word[i + 1:]
+            break
+    else:
+        return word
+    r2 = _region(word)
+    r2 = _region(word[r2:]) + r2
+
+    rv = _inflection(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    for ending in DERIVATIONAL:
+        if rv.endswith(ending) and len(prefix) + len(rv) - len(ending) >= r2:
+            rv = rv[:-len(ending)]
+            break
+    return prefix + _tidy(rv)
+
+
+def terms(text):
+    """Нормализованные термы текста: без стоп-слов, со стеммингом."""
+    for word in WORD_RE.findall(text.lower()):
+        if word in STOP_WORDS or word.isdigit() and len(word) < 2:
+            continue
+        yield stem(word)[:MAX_TERM_LENGTH]
+
+
+def index_post(post):
+    frequencies = Counter(terms(post.text))
+    with transaction.atomic():
+        SearchEntry.objects.filter(post=post).delete()
+        SearchEntry.objects.bulk_create(
+            SearchEntry(post=post, term=term, weight=weight)
+            for term, weight in frequencies.items())
+
+
+def _nothing():
+    return Post.objects.annotate(
+        rank=Value(0, output_field=IntegerField())).none()
+
+
+def search_posts(query):
+    """Посты, содержащие все термы запроса, с рангом TF-IDF в ``rank``."""
+    query_terms = list(dict.fromkeys(terms(query)))[:MAX_QUERY_TERMS]
+    if not query_terms:
+        return _nothing()
+    total = Post.objects.count() or 1
+    frequencies = dict(SearchEntry.objects.filter(term__in=query_terms)
+                       .values_list('term')
+                       .annotate(documents=Count('post'))
+                       .order_by())
+    if len(frequencies) < len(query_terms):
+        return _nothing()
+    # целочисленный ранг стабилен при сравнении в курсоре
+    weights = [
+        When(search_entries__term=term,
+             then=F('search_entries__weight')
+             * Value(1 + int(1000 * math.log(total / documents + 1))))
+        for term, documents in frequencies.items()]
+    return (Post.objects.for_feed()
+            .filter(search_entries__term__in=query_terms)
+            .annotate(rank=Sum(Case(*weights, output_field=IntegerField())),
+                      matched=Count('search_entries__term', distinct=True))
+            .filter(matched=len(query_terms)))
@@ -0,0 +1,191 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import DEFERRED, F
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from . import tasks, timeline
+from .cache import adjust_count, bump_feed_version, forget_count
+from .routers import replica_aliases
+from .models import (AuthorStats, Comment, Follow, Group, Post, StoredFile,
+                     User)
+from .queue import enqueue
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_feeds(sender, using, **kwargs):
+    # до коммита другие процессы ещё читают старые строки и закэшировали
+    # бы их под новой версией
+    transaction.on_commit(feeds_changed, using=using)
+
+
+def feeds_changed():
+    bump_feed_version()
+    if replica_aliases():
+        # фрагмент, собранный по отстающей реплике сразу после записи,
+        # сбрасывается ещё раз, когда она догонит основную базу
+        enqueue(bump_feed_version, delay=settings.REPLICA_LAG)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.bump(instance.author_id, 'post_count', 1)
+        adjust_count('all', 1)
+        if instance.group_id:
+            adjust_count(f'group:{instance.group_id}', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    AuthorStats.objects.bump(instance.author_id, 'post_count', -1)
+    adjust_count('all', -1)
+    if instance.group_id:
+        adjust_count(f'group:{instance.group_id}', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.bump(instance.author_id, 'follower_count', 1)
+        AuthorStats.objects.bump(instance.user_id, 'following_count', 1)
+        forget_count(f'follow:{instance.user_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    with transaction.atomic():
+        # строка счётчика заблокирована до коммита: порог раздачи увидит
+        # ровно одна из параллельных отписок
+        AuthorStats.objects.bump(instance.author_id, 'follower_count', -1)
+        returned = AuthorStats.objects.filter(
+            user_id=instance.author_id,
+            follower_count=settings.TIMELINE_FANOUT_LIMIT).exists()
+    AuthorStats.objects.bump(instance.user_id, 'following_count', -1)
+    forget_count(f'follow:{instance.user_id}')
+    if returned:
+        # автор вернулся под порог: его посты больше не читаются при
+        # чтении ленты, их нужно раздать подписчикам
+        enqueue(tasks.fan_out_author, instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).bump_card_version(
+            comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).bump_card_version(
+        comment_count=F('comment_count') - 1)
+
+
+@receiver(post_save, sender=Post)
+def bump_edited_card(sender, instance, created, **kwargs):
+    if not created:
+        Post.objects.filter(pk=instance.pk).bump_card_version()
+
+
+@receiver(post_save, sender=Group)
+def bump_group_cards(sender, instance, created, **kwargs):
+    # название и адрес группы выводятся в карточках её постов
+    if not created:
+        Post.objects.filter(group=instance).bump_card_version()
+
+
+@receiver(pre_delete, sender=Group)
+def bump_ungrouped_cards(sender, instance, **kwargs):
+    # SET_NULL обнуляет ссылку одним UPDATE, без сигналов постов
+    Post.objects.filter(group=instance).bump_card_version()
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._stored_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def bump_renamed_author_cards(sender, instance, created, using, **kwargs):
+    username = instance.__dict__.get('username')
+    if created or username == instance._stored_username:
+        return
+    # имя автора выводится в карточках его постов и в лентах
+    Post.objects.filter(author=instance).bump_card_version()
+    invalidate_feeds(sender, using=using)
+    instance._stored_username = username
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        enqueue(tasks.fan_out_post, instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created and instance.user_id and instance.author_id:
+        enqueue(tasks.backfill_timeline, instance.user_id,
+                instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    if instance.user_id and instance.author_id:
+        timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_for_search(sender, instance, **kwargs):
+    enqueue(tasks.index_post, instance.pk)
+
+
+def _image_name(instance):
+    # сырое значение поля без обращения к дескриптору: у отложенного
+    # поля его нет, и запрос за ним не нужен
+    value = instance.__dict__.get('image', DEFERRED)
+    if value is DEFERRED:
+        return DEFERRED
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    instance._stored_image = _image_name(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, created, **kwargs):
+    image = _image_name(instance)
+    previous = '' if created else instance._stored_image
+    if DEFERRED in (image, previous) or image == previous:
+        return
+    StoredFile.objects.retain(image)
+    StoredFile.objects.release(previous)
+    instance._stored_image = image
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    image = _image_name(instance)
+    if image is not DEFERRED:
+        StoredFile.objects.release(image)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
@@ -0,0 +1,43 @@
+"""Хранилище картинок постов по хэшу содержимого.
+
+Файл сохраняется как ``<каталог>/ab/<sha256>.<расширение>``: одинаковые
+загрузки ложатся в один файл, а содержимое по адресу никогда не меняется,
+поэтому такие адреса можно кэшировать навсегда. Сколько постов ссылается
+на файл, хранит ``StoredFile``; ненужные файлы удаляет ``collect_media``.
+"""
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASHED_NAME = re.compile(r'(?:.*/)?[0-9a-f]{2}/([0-9a-f]{64})\.\w+')
+
+
+def content_hash_of(name):
+    """Хэш из имени файла в хранилище или ``None`` для других имён."""
+    match = HASHED_NAME.fullmatch(name or '')
+    return match.group(1) if match else None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content_hash = digest.hexdigest()
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        return os.path.join(directory, content_hash[:2],
+                            content_hash + extension)
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        # такой файл уже есть, и содержимое у него то же самое; время
+        # изменения обновляется, чтобы collect_media не счёл его брошенным
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
@@ -0,0 +1,79 @@
+"""Побочные действия записи, которые выполняются через очередь.
+
+Задачи получают id, а не объекты: к выполнению строка могла измениться
+или исчезнуть.
+"""
+from django.db import transaction
+
+from . import search, timeline
+from .cache import bump_feed_version
+from .images import reencode
+from .models import Follow, Post, StoredFile
+from .storage import content_hash_of
+from .thumbnails import generate_thumbnail
+
+
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).only('author').first()
+    if post is not None:
+        timeline.fan_out(post)
+        bump_feed_version()
+
+
+def backfill_timeline(user_id, author_id):
+    # подписку могли отменить, пока задача ждала в очереди
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
+        bump_feed_version()
+
+
+def fan_out_author(author_id):
+    timeline.fan_out_author(author_id)
+    bump_feed_version()
+
+
+def index_post(post_id):
+    post = Post.objects.filter(pk=post_id).only('text').first()
+    if post is not None:
+        search.index_post(post)
+
+
+def optimize_image(post):
+    """Заменяет картинку поста перекодированной копией без метаданных.
+
+    Исходная загрузка лежит в хранилище под своим хэшем, он же
+    ``image_hash``; копия — под хэшем нового содержимого, так что
+    повторная обработка и одинаковые загрузки её не дублируют.
+    """
+    original = post.image.name
+    if content_hash_of(original) != post.image_hash:
+        return
+    with post.image.open('rb') as file:
+        encoded = reencode(file)
+    if encoded is None:
+        return
+    content, extension, fields = encoded
+    name = post.image.storage.save(f'posts/image.{extension}', content)
+    with transaction.atomic():
+        # картинку могли заменить, пока она перекодировалась; строка
+        # заблокирована до переноса ссылок
+        current = (Post.objects.select_for_update().filter(pk=post.pk)
+                   .values_list('image', flat=True).first())
+        if current != original:
+            return
+        Post.objects.filter(pk=post.pk).bump_card_version(image=name,
+                                                          **fields)
+        # update() не шлёт сигналов: ссылки переносятся здесь, а исходный
+        # файл без ссылок удалит collect_media
+        StoredFile.objects.retain(name)
+        StoredFile.objects.release(original)
+
+
+def process_image(post_id):
+    post = (Post.objects.filter(pk=post_id)
+            .only('image', 'image_hash').first())
+    if post is None or not post.image:
+        return
+    if post.image_hash:
+        optimize_image(post)
+    generate_thumbnail(post_id)
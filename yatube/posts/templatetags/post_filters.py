@@ -0,0 +1,16 @@
+from django import template
+
+from posts.paginators import page_window
+
+register = template.Library()
+
+
+@register.filter
+def window(page, on_each_side=2):
+    return list(page_window(page, on_each_side))
+
+
+@register.filter
+def srcset(thumbnails):
+    return ', '.join(f"{thumbnail['url']} {thumbnail['width']}w"
+                     for thumbnail in thumbnails)
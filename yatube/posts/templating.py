@@ -0,0 +1,41 @@
+import logging
+import os
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.template.utils import get_app_template_dirs
+
+logger = logging.getLogger(__name__)
+
+
+def project_template_dirs():
+    """Каталоги шаблонов проекта и его приложений, без сторонних пакетов."""
+    dirs = [directory for engine in settings.TEMPLATES
+            for directory in engine.get('DIRS', [])]
+    dirs += [directory for directory in get_app_template_dirs('templates')
+             if directory.startswith(settings.BASE_DIR)]
+    return dirs
+
+
+def template_names():
+    for directory in project_template_dirs():
+        for root, _, files in os.walk(directory):
+            for name in sorted(files):
+                if name.endswith('.html'):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, directory)
+
+
+def warm_templates():
+    """Разбирает шаблоны заранее, чтобы кэширующий загрузчик не делал
+    этого на первых запросах воркера."""
+    count = 0
+    for name in template_names():
+        try:
+            get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError):
+            logger.exception('Template %s was not warmed up', name)
+            continue
+        count += 1
+    return count
@@ -0,0 +1,121 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Книги', slug='books',
+                                         description='о книгах')
+        for i in range(25):
+            Post.objects.create(text=f'post {i}', author=cls.author,
+                                group=cls.group if i % 2 else None)
+        cls.post = Post.objects.order_by('-pub_date', '-id').first()
+        Comment.objects.create(post=cls.post, author=cls.reader,
+                               text='первый')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.guest = Client()
+
+    def get(self, url, client=None, **params):
+        response = (client or self.guest).get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return json.loads(b''.join(response.streaming_content))
+
+    def walk(self, url, client=None):
+        seen = []
+        data = self.get(url, client, limit=7)
+        seen.extend(row['id'] for row in data['results'])
+        while data['next']:
+            data = self.get(url, client, limit=7, after=data['next'])
+            seen.extend(row['id'] for row in data['results'])
+        return seen
+
+    def test_feeds_walk_in_order(self):
+        """Курсоры API проходят каждую ленту целиком по порядку"""
+        posts = Post.objects.order_by('-pub_date', '-id')
+        client = Client()
+        client.force_login(self.reader)
+        cases = {
+            reverse('api_index'): posts,
+            reverse('api_group_posts', kwargs={'slug': 'books'}):
+                posts.filter(group=self.group),
+            reverse('api_profile', kwargs={'username': 'author'}): posts,
+            reverse('api_follow_index'): posts,
+        }
+        for url, expected in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.walk(url, client),
+                                 list(expected.values_list('id', flat=True)))
+
+    def test_previous_cursor(self):
+        first = self.get(reverse('api_index'), limit=5)
+        second = self.get(reverse('api_index'), limit=5,
+                          after=first['next'])
+        back = self.get(reverse('api_index'), limit=5,
+                        before=second['previous'])
+        self.assertEqual(back['results'], first['results'])
+
+    def test_post_fields(self):
+        row = self.get(reverse('api_index'), limit=1)['results'][0]
+        self.assertEqual(row['id'], self.post.pk)
+        self.assertEqual(row['author'], 'author')
+        self.assertEqual(row['comment_count'], 1)
+        self.assertIsNone(row['image'])
+        self.assertEqual(row['thumbnails'], [])
+
+    def test_post_view_with_comments(self):
+        data = self.get(reverse('api_post', kwargs={
+            'username': 'author', 'post_id': self.post.pk}))
+        self.assertEqual(data['post']['text'], self.post.text)
+        self.assertEqual([comment['text'] for comment in data['comments']],
+                         ['первый'])
+        self.assertEqual(data['comments'][0]['author'], 'reader')
+
+    def test_post_comments_walk_in_order(self):
+        """Комментарии поста отдаются страницами по курсору ``after``"""
+        for i in range(4):
+            Comment.objects.create(post=self.post, author=self.reader,
+                                   text=f'ещё {i}')
+        url = reverse('api_post', kwargs={'username': 'author',
+                                          'post_id': self.post.pk})
+        texts = []
+        data = self.get(url, limit=2)
+        self.assertEqual(len(data['comments']), 2)
+        texts.extend(comment['text'] for comment in data['comments'])
+        while data['next']:
+            data = self.get(url, limit=2, after=data['next'])
+            self.assertEqual(data['post']['id'], self.post.pk)
+            texts.extend(comment['text'] for comment in data['comments'])
+        self.assertEqual(texts, ['первый', 'ещё 0', 'ещё 1', 'ещё 2',
+                                 'ещё 3'])
+        self.assertEqual(self.guest.get(url, {'after': 'garbage'})
+                         .status_code, 400)
+
+    def test_errors(self):
+        self.assertEqual(
+            self.guest.get(reverse('api_follow_index')).status_code, 401)
+        self.assertEqual(
+            self.guest.get(reverse('api_index'),
+                           {'after': 'garbage'}).status_code, 400)
+        self.assertEqual(
+            self.guest.get(reverse('api_group_posts',
+                                   kwargs={'slug': 'none'})).status_code,
+            404)
+
+    def test_page_is_one_query(self):
+        """Одна выборка на страницу, без COUNT(*)"""
+        with self.assertNumQueries(1):
+            self.get(reverse('api_index'), limit=5)
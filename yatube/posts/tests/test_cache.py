@@ -1,9 +1,18 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import (Client, SimpleTestCase, TestCase,
+                         TransactionTestCase)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Group, Post
-from yatube.settings import CACHES
+from posts.cache_backends import SQLiteCache
+from posts.models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -24,7 +33,242 @@ class cacheTest(TestCase):
         self.assertTrue(Post.objects.filter(id=post_not_in_cache.id).exists())
         self.assertEqual(len(response.context["page"].object_list),
                          Post.objects.count() - 1)
-        CACHES.clear()
+        cache.clear()
         response = self.guest.get(reverse('index'))
         self.assertEqual(len(response.context["page"].object_list),
                          Post.objects.count())
+
+
+# версия лент меняется после коммита, а TestCase не коммитит
+class FeedCacheTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='test_user')
+        self.group = Group.objects.create(title='test cache group',
+                                          slug='test',
+                                          description='cache group')
+        for i in range(15):
+            Post.objects.create(text=f'cached post {i}', author=self.user,
+                                group=self.group)
+        self.guest = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_pages_are_cached_separately(self):
+        """Вторая страница не отдаёт закэшированную первую"""
+        first = self.guest.get(reverse('index')).content.decode()
+        second = self.guest.get(reverse('index') + '?page=2').content.decode()
+        self.assertIn('cached post 14', first)
+        self.assertNotIn('cached post 14', second)
+        self.assertIn('cached post 0', second)
+
+    def test_new_post_invalidates_feeds(self):
+        """Новый пост сразу появляется в закэшированных лентах"""
+        urls = (reverse('index'),
+                reverse('group_posts', kwargs={'slug': 'test'}),
+                reverse('profile', kwargs={'username': 'test_user'}))
+        for url in urls:
+            self.guest.get(url)
+        Post.objects.create(text='fresh post', author=self.user,
+                            group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest.get(url)
+                self.assertIn('fresh post', response.content.decode())
+
+    def test_comment_invalidates_feeds(self):
+        """Новый комментарий обновляет счётчик в закэшированной ленте"""
+        self.authorized_client.get(reverse('index'))
+        Comment.objects.create(post=Post.objects.first(), author=self.user,
+                               text='comment')
+        response = self.authorized_client.get(reverse('index'))
+        self.assertIn('Комментариев: 1', response.content.decode())
+
+    def test_anonymous_and_authorized_variants(self):
+        """Гость не получает фрагмент, закэшированный для пользователя"""
+        self.authorized_client.get(reverse('index'))
+        response = self.guest.get(reverse('index'))
+        self.assertNotIn('Редактировать', response.content.decode())
+
+
+def render_elsewhere(url):
+    """Запрос из другого потока, то есть через другое соединение с базой."""
+    result = {}
+
+    def render():
+        try:
+            result['response'] = Client().get(url)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=render)
+    thread.start()
+    thread.join()
+    return result['response']
+
+
+def increment_many(location, times):
+    backend = SQLiteCache(location, {})
+    for _ in range(times):
+        backend.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.directory.name, 'cache.sqlite3')
+        self.backend = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_set_get_delete(self):
+        """Значения сохраняются, читаются и удаляются"""
+        self.backend.set('key', {'value': 1})
+        self.assertEqual(self.backend.get('key'), {'value': 1})
+        self.assertFalse(self.backend.add('key', 'other'))
+        self.backend.delete('key')
+        self.assertIsNone(self.backend.get('key'))
+
+    def test_expired_value_is_missing(self):
+        """Просроченное значение не возвращается"""
+        self.backend.set('key', 'value', timeout=-1)
+        self.assertIsNone(self.backend.get('key'))
+        self.assertTrue(self.backend.add('key', 'value'))
+
+    def test_incr_is_atomic_across_processes(self):
+        """Счётчик не теряет увеличений из разных процессов"""
+        self.backend.set('counter', 0, timeout=None)
+        workers = [multiprocessing.Process(target=increment_many,
+                                           args=(self.location, 50))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.backend.get('counter'), 200)
+
+    def test_incr_missing_key(self):
+        with self.assertRaises(ValueError):
+            self.backend.incr('missing')
+
+
+class ConditionalGetTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='test_user')
+        self.post = Post.objects.create(text='etag post', author=self.user)
+        self.guest = Client()
+        self.urls = (
+            reverse('index'),
+            reverse('profile', kwargs={'username': self.user.username}),
+            reverse('post', kwargs={'username': self.user.username,
+                                    'post_id': self.post.pk}),
+        )
+
+    def test_unchanged_page_is_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304 без запросов к постам"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest.get(url)['ETag']
+                with CaptureQueriesContext(connection) as captured:
+                    response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertFalse([query for query in captured
+                                  if 'posts_post' in query['sql']])
+
+    def test_etag_changes_after_comment(self):
+        url = self.urls[2]
+        etag = self.guest.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='new comment')
+        response = self.guest.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'new comment')
+
+    def test_page_rendered_before_commit_is_not_reused(self):
+        """Страница, собранная другим соединением до коммита, устаревает"""
+        reader = User.objects.create(username='reader')
+        # подписка не трогает таблиц главной, поэтому незакоммиченная
+        # запись не блокирует чтение и на sqlite
+        with transaction.atomic():
+            Follow.objects.create(user=reader, author=self.user)
+            etag = render_elsewhere(self.urls[0])['ETag']
+        response = self.guest.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user_and_page(self):
+        etag = self.guest.get(self.urls[0])['ETag']
+        self.assertNotEqual(
+            etag, self.guest.get(self.urls[0] + '?page=2')['ETag'])
+        client = Client()
+        client.force_login(self.user)
+        self.assertEqual(
+            client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag).status_code,
+            200)
+
+
+class PostCardCacheTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create(username='author')
+        self.reader = User.objects.create(username='reader')
+        self.post = Post.objects.create(text='исходный текст',
+                                        author=self.author)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_card_is_shared_between_feeds(self):
+        """Карточка, собранная для главной, переиспользуется в профиле"""
+        self.reader_client.get(reverse('index'))
+        # update() не меняет версию карточки: виден кэш
+        Post.objects.filter(pk=self.post.pk).update(text='тихая правка')
+        response = self.reader_client.get(
+            reverse('profile', kwargs={'username': 'author'}))
+        self.assertContains(response, 'исходный текст')
+
+    def test_user_parts_are_not_cached(self):
+        self.reader_client.get(reverse('index'))
+        response = self.author_client.get(reverse('index'))
+        self.assertContains(response, 'Редактировать')
+        response = self.reader_client.get(
+            reverse('profile', kwargs={'username': 'author'}))
+        self.assertNotContains(response, 'Редактировать')
+
+    def test_edit_and_comment_bump_version(self):
+        self.reader_client.get(reverse('index'))
+        self.author_client.post(
+            reverse('post_edit', kwargs={'username': 'author',
+                                         'post_id': self.post.pk}),
+            {'text': 'исправленный текст'})
+        self.assertContains(self.reader_client.get(reverse('index')),
+                            'исправленный текст')
+        Post.objects.filter(pk=self.post.pk).update(text='тихая правка')
+        self.reader_client.post(
+            reverse('add_comment', kwargs={'username': 'author',
+                                           'post_id': self.post.pk}),
+            {'text': 'комментарий'})
+        response = self.reader_client.get(reverse('index'))
+        self.assertContains(response, 'тихая правка')
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_group_and_author_changes_bump_version(self):
+        """Переименования группы и автора и удаление группы видны в карточке"""
+        group = Group.objects.create(title='старая группа', slug='old',
+                                     description='группа')
+        self.post.group = group
+        self.post.save()
+        self.reader_client.get(reverse('index'))
+        group.title = 'новая группа'
+        group.save()
+        self.assertContains(self.reader_client.get(reverse('index')),
+                            'новая группа')
+        self.author.username = 'renamed'
+        self.author.save()
+        self.assertContains(self.reader_client.get(reverse('index')),
+                            '@renamed')
+        group.delete()
+        self.assertNotContains(self.reader_client.get(reverse('index')),
+                               'новая группа')
@@ -0,0 +1,36 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+
+@skipUnless(connection.vendor == 'sqlite', 'настройки SQLite')
+class SQLiteSettingsTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_is_tuned(self):
+        """Новое соединение с SQLite не ждёт fsync на каждой записи"""
+        connection.close()
+        connection.ensure_connection()
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+    def test_busy_timeout(self):
+        """Пишущий ждёт освобождения блокировки, а не падает сразу"""
+        connection.close()
+        connection.ensure_connection()
+        self.assertGreater(self.pragma('busy_timeout'), 0)
+
+
+class ExplainFeedsTest(TestCase):
+    def test_command_runs(self):
+        """Замер планов запросов наполняет свою базу и показывает планы"""
+        output = StringIO()
+        call_command('explain_feeds', posts=100, users=5, groups=2,
+                     stdout=output)
+        self.assertIn('С индексами лент', output.getvalue())
+        self.assertIn('index:', output.getvalue())
@@ -0,0 +1,70 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from posts.tests.utils import TempMediaMixin, make_image
+
+User = get_user_model()
+
+
+class ImageMetadataTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def publish(self, text, image):
+        self.client.post(reverse('new_post'),
+                         data={'text': text, 'image': image})
+        return Post.objects.get(text=text)
+
+    def test_metadata_is_stored_on_upload(self):
+        """Размеры, объём, хэш и тип картинки сохраняются при загрузке"""
+        post = self.publish('with image', make_image(size=(640, 480)))
+        self.assertEqual((post.image_width, post.image_height), (640, 480))
+        self.assertEqual(post.image_size, post.image.size)
+        self.assertEqual(len(post.image_hash), 64)
+        # PNG без прозрачности перекодирован в JPEG
+        self.assertEqual(post.image_mime, 'image/jpeg')
+
+    def test_identical_upload_reuses_file(self):
+        """Повторная загрузка того же файла не создаёт копию"""
+        first = self.publish('first', make_image('a.png'))
+        second = self.publish('second', make_image('b.png'))
+        self.assertEqual(second.image.name, first.image.name)
+        # описание от перекодированного файла, а не от исходной загрузки
+        self.assertEqual(second.image_mime, 'image/jpeg')
+        self.assertEqual(second.image_size, second.image.size)
+        self.assertEqual((second.image_width, second.image_height),
+                         (first.image_width, first.image_height))
+        third = self.publish('third', make_image('c.png', size=(10, 10)))
+        self.assertNotEqual(third.image.name, first.image.name)
+
+    def test_clearing_image_resets_metadata(self):
+        post = self.publish('with image', make_image())
+        self.client.post(
+            reverse('post_edit', kwargs={'username': 'author',
+                                         'post_id': post.pk}),
+            data={'text': 'without image', 'image-clear': 'on'})
+        post.refresh_from_db()
+        self.assertFalse(post.image)
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_hash, '')
+
+    def test_fill_command_backfills_old_posts(self):
+        post = Post.objects.create(text='old', author=self.user)
+        post.image.save('old.png', ContentFile(make_image().read()))
+        Post.objects.create(text='missing file', author=self.user,
+                            image='posts/missing.png')
+        call_command('fill_image_metadata', stdout=io.StringIO(),
+                     stderr=io.StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (1200, 800))
+        self.assertEqual(post.image_mime, 'image/png')
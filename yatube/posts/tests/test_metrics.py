@@ -0,0 +1,80 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import metrics
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DEBUG=True)
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.clear()
+        self.user = User.objects.create_user(username='author')
+        for i in range(3):
+            Post.objects.create(text=f'post {i}', author=self.user)
+        self.client = Client()
+
+    def snapshot(self):
+        response = self.client.get(reverse('metrics') + '?format=json')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_request_is_recorded_under_view_name(self):
+        """Замеры запроса попадают в гистограммы своего представления"""
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        index = self.snapshot()['posts.views.index']
+        self.assertEqual(index['duration_seconds']['count'], 2)
+        self.assertGreater(index['queries']['sum'], 0)
+        self.assertGreater(index['sql_seconds']['sum'], 0)
+        self.assertGreater(index['template_seconds']['sum'], 0)
+
+    def test_duplicate_queries_are_counted(self):
+        """Один и тот же SQL в цикле считается повтором"""
+        with metrics.collect('loop'):
+            for post in Post.objects.all():
+                User.objects.get(pk=post.author_id)
+        loop = metrics.registry.snapshot()['loop']
+        self.assertEqual(loop['queries']['sum'], 4)
+        self.assertEqual(loop['duplicate_queries']['sum'], 2)
+
+    def test_prometheus_format(self):
+        self.client.get(reverse('index'))
+        response = self.client.get(reverse('metrics'))
+        text = response.content.decode()
+        self.assertIn('# TYPE yatube_view_queries histogram', text)
+        self.assertIn('yatube_view_duration_seconds_count'
+                      '{view="posts.views.index"} 1', text)
+        self.assertIn('le="+Inf"', text)
+
+    def test_prometheus_counters_survive_the_window(self):
+        """Счётчики Prometheus не уменьшаются, когда замер выходит из окна"""
+        window = metrics.Registry(window=2)
+        for _ in range(3):
+            window.observe('view', dict.fromkeys(metrics.SERIES, 0.001))
+        self.assertEqual(window.snapshot()['view']['queries']['count'], 2)
+        text = metrics.to_prometheus(window.totals())
+        self.assertIn('yatube_view_queries_count{view="view"} 3', text)
+        self.assertIn('yatube_view_queries_bucket{view="view",le="1"} 3',
+                      text)
+
+    @override_settings(DEBUG=False, METRICS_TOKEN='secret')
+    def test_access_outside_debug(self):
+        """Без DEBUG замеры доступны только staff или по токену"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code,
+                         404)
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code,
+                         200)
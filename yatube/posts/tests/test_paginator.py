@@ -0,0 +1,232 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post
+from posts.paginators import CountedPaginator, CursorPaginator, page_window
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='cursor')
+        cls.group = Group.objects.create(title='testGroup',
+                                         slug='test',
+                                         description='cursor group')
+        for i in range(25):
+            Post.objects.create(text=f'post {i}', author=cls.user,
+                                group=cls.group)
+
+    def setUp(self):
+        self.guest = Client()
+
+    def walk(self, url):
+        seen = []
+        with self.settings(POSTS_CURSOR_PAGINATION=True):
+            response = self.guest.get(url)
+            page = response.context['page']
+            seen.extend(post.id for post in page)
+            while page.has_next():
+                response = self.guest.get(url + f'?after={page.next_cursor}')
+                page = response.context['page']
+                seen.extend(post.id for post in page)
+        return seen, page
+
+    def test_cursor_walk_covers_feed_in_order(self):
+        """Переход по курсорам выдаёт все посты ровно один раз по порядку"""
+        expected = list(Post.objects.order_by('-pub_date', '-id')
+                        .values_list('id', flat=True))
+        for url in (reverse('index'),
+                    reverse('group_posts', kwargs={'slug': 'test'}),
+                    reverse('profile', kwargs={'username': 'cursor'})):
+            with self.subTest(url=url):
+                seen, last_page = self.walk(url)
+                self.assertEqual(seen, expected)
+                self.assertEqual(len(last_page), 5)
+                self.assertFalse(last_page.has_next())
+
+    def test_cursor_before_returns_previous_page(self):
+        """Курсор before возвращает предыдущую страницу"""
+        with self.settings(POSTS_CURSOR_PAGINATION=True):
+            first = self.guest.get(reverse('index')).context['page']
+            second = self.guest.get(
+                reverse('index') + f'?after={first.next_cursor}'
+            ).context['page']
+            back = self.guest.get(
+                reverse('index') + f'?before={second.previous_cursor}'
+            ).context['page']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_cursor_page_does_not_count(self):
+        """Страница по курсору не выполняет COUNT(*)"""
+        with self.settings(POSTS_CURSOR_PAGINATION=True):
+            first = self.guest.get(reverse('index')).context['page']
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        with self.assertNumQueries(1):
+            page = paginator.cursor_page(after=first.next_cursor)
+            self.assertEqual(len(page), 10)
+
+    def test_cursor_page_keeps_page_protocol(self):
+        """Курсорная страница отвечает на методы обычной страницы"""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.cursor_page()
+        second = paginator.cursor_page(after=first.next_cursor)
+        self.assertEqual(first.next_page_number(), first.next_cursor)
+        self.assertIsNone(first.previous_page_number())
+        self.assertEqual(second.previous_page_number(),
+                         second.previous_cursor)
+        self.assertEqual((second.start_index(), second.end_index()),
+                         (1, 10))
+        empty = CursorPaginator(Post.objects.none(), 10).cursor_page()
+        self.assertEqual((empty.start_index(), empty.end_index()), (0, 0))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор ведёт на первую страницу"""
+        response = self.guest.get(reverse('index') + '?after=garbage')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page'][0],
+                         Post.objects.order_by('-pub_date', '-id').first())
+
+
+class CountedPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='counted')
+        for i in range(25):
+            Post.objects.create(text=f'post {i}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+        self.posts = Post.objects.order_by('-pub_date', '-id')
+
+    def test_feed_counts_once(self):
+        """COUNT(*) выполняется при промахе кэша, а не на каждой странице"""
+        self.guest.get(reverse('index'))
+        with CaptureQueriesContext(connection) as captured:
+            page = self.guest.get(reverse('index') + '?page=2'
+                                  ).context['page']
+        self.assertFalse([query for query in captured
+                          if 'COUNT(' in query['sql']])
+        self.assertEqual(page.paginator.num_pages, 3)
+
+    def test_new_post_updates_cached_count(self):
+        self.guest.get(reverse('index'))
+        for i in range(6):
+            Post.objects.create(text=f'extra {i}', author=self.user)
+        page = self.guest.get(reverse('index')).context['page']
+        self.assertEqual(page.paginator.count, 31)
+
+    def test_stale_low_count_still_shows_next_page(self):
+        """Заниженная оценка не прячет следующие страницы"""
+        page = CountedPaginator(self.posts, 10, count=5).get_page(1)
+        self.assertTrue(page.has_next())
+        page = CountedPaginator(self.posts, 10, count=5).get_page(3)
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next())
+
+    def test_stale_high_count_has_no_phantom_pages(self):
+        """Завышенная оценка не добавляет пустых страниц в конце"""
+        page = CountedPaginator(self.posts, 10, count=500).get_page(3)
+        self.assertFalse(page.has_next())
+        self.assertEqual(page.paginator.num_pages, 3)
+
+    def test_number_past_the_end_gives_last_page(self):
+        """Номер за концом ленты даёт последнюю страницу, а не пустую"""
+        with self.assertRaises(EmptyPage):
+            CountedPaginator(self.posts, 10, count=25).page(999)
+        page = CountedPaginator(self.posts, 10, count=25).get_page(999)
+        self.assertEqual((page.number, len(page)), (3, 5))
+        self.assertEqual(page.paginator.num_pages, 3)
+        page = self.guest.get(reverse('index') + '?page=999').context['page']
+        self.assertEqual(page.number, 3)
+        self.assertEqual(list(page_window(page)), [1, 2, 3])
+
+    def test_invalid_number_gives_first_page(self):
+        for number in ('abc', '0', '-1'):
+            with self.subTest(number=number):
+                page = CountedPaginator(self.posts, 10, 25).get_page(number)
+                self.assertEqual(page.number, 1)
+
+    def test_page_window(self):
+        """Номера страниц ограничены окном вокруг текущей"""
+        paginator = CountedPaginator(self.posts, 1, count=30)
+        paginator.count = 30
+        self.assertEqual(list(page_window(paginator.page(15))),
+                         [1, None, 13, 14, 15, 16, 17, None, 30])
+        self.assertEqual(list(page_window(paginator.page(2))),
+                         [1, 2, 3, 4, None, 30])
+
+    def test_paginator_renders_window(self):
+        response = self.guest.get(reverse('index') + '?page=2')
+        self.assertContains(response, '?page=3')
+
+
+@override_settings(COMMENTS_IN_PAGE=10)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='commentator')
+        cls.busy = Post.objects.create(text='обсуждаемый', author=cls.user)
+        cls.quiet = Post.objects.create(text='тихий', author=cls.user)
+        Comment.objects.bulk_create(
+            [Comment(post=cls.busy, author=cls.user, text=f'comment {i}')
+             for i in range(45)]
+            + [Comment(post=cls.quiet, author=cls.user, text='один')])
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Client()
+
+    def url(self, name, post):
+        return reverse(name, kwargs={'username': 'commentator',
+                                     'post_id': post.id})
+
+    def test_first_chunk_inline(self):
+        response = self.guest.get(self.url('post', self.busy))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 10)
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, self.url('post_comments', self.busy))
+
+    def test_fragments_walk_all_comments(self):
+        """Догрузка по курсору проходит все комментарии по одному разу"""
+        comments = self.guest.get(self.url('post', self.busy)).context[
+            'comments']
+        seen = [comment.id for comment in comments]
+        while comments.has_next():
+            response = self.guest.get(self.url('post_comments', self.busy),
+                                      {'after': comments.next_cursor})
+            self.assertTemplateNotUsed(response, 'base.html')
+            comments = response.context['comments']
+            seen.extend(comment.id for comment in comments)
+        expected = self.busy.comments.order_by('-created', '-id')
+        self.assertEqual(seen, list(expected.values_list('id', flat=True)))
+
+    def test_queries_do_not_grow_with_comments(self):
+        """Число запросов страницы поста не зависит от числа комментариев"""
+        queries = []
+        for post in (self.quiet, self.busy):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                self.guest.get(self.url('post', post))
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_invalid_cursor(self):
+        response = self.guest.get(self.url('post_comments', self.busy),
+                                  {'after': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+        response = self.guest.get(self.url('post', self.busy),
+                                  {'after': 'garbage'})
+        self.assertEqual(len(response.context['comments']), 10)
@@ -0,0 +1,117 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import tasks
+from posts.cache import bump_feed_version, feed_version
+from posts.models import Follow, Post, SearchEntry, Task, TimelineEntry
+from posts.queue import claim, enqueue, release_stale, run_task
+
+User = get_user_model()
+
+
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(TASKS_EAGER=False)
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def run_worker(self):
+        call_command('run_tasks', processes=0, once=True, stdout=StringIO())
+
+    def test_side_effects_wait_for_worker(self):
+        """Раздача в ленты и индексация выполняются воркером"""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        self.run_worker()
+        self.client.post(reverse('new_post'), {'text': 'отложенный пост'})
+        post = Post.objects.get()
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertFalse(SearchEntry.objects.exists())
+        self.run_worker()
+        self.assertTrue(TimelineEntry.objects.filter(user=reader,
+                                                     post=post).exists())
+        self.assertTrue(SearchEntry.objects.filter(post=post).exists())
+        self.assertFalse(Task.objects.exists())
+
+    def test_new_post_queries_do_not_grow_with_followers(self):
+        """Публикация не зависит от числа подписчиков автора"""
+        queries = []
+        for followers in (range(1), range(1, 30)):
+            for i in followers:
+                reader = User.objects.create_user(username=f'reader{i}')
+                Follow.objects.create(user=reader, author=self.author)
+            with CaptureQueriesContext(connection) as context:
+                self.client.post(reverse('new_post'), {'text': 'пост'})
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_waiting_duplicate_is_skipped(self):
+        enqueue(tasks.index_post, 1)
+        enqueue(tasks.index_post, 1)
+        enqueue(tasks.index_post, 2)
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_delayed_duplicate_is_postponed(self):
+        """Повтор отложенной задачи сдвигает её срок, а не теряется"""
+        enqueue(bump_feed_version, delay=1)
+        first = Task.objects.get().run_at
+        enqueue(bump_feed_version, delay=5)
+        task = Task.objects.get()
+        self.assertGreater(task.run_at, first)
+        Task.objects.update(run_at=timezone.now())
+        version = feed_version()
+        self.run_worker()
+        self.assertGreater(feed_version(), version)
+
+    def test_failed_task_is_retried_then_kept(self):
+        enqueue(explode, max_attempts=2)
+        [pk] = claim(10)
+        with self.assertLogs('posts.queue', 'ERROR'):
+            run_task(pk)
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.PENDING, 1))
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertEqual(claim(10), [])
+        Task.objects.update(run_at=timezone.now())
+        [pk] = claim(10)
+        with self.assertLogs('posts.queue', 'ERROR'):
+            run_task(pk)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertIn('boom', task.last_error)
+
+    def test_stale_task_returns_to_queue(self):
+        enqueue(tasks.index_post, 1)
+        claim(10)
+        Task.objects.update(locked_at=timezone.now() - timedelta(days=1))
+        release_stale()
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.PENDING, 1))
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_task_error_is_raised(self):
+        """Без воркера ошибка задачи видна сразу, а не только в логе"""
+        with self.assertRaisesMessage(ValueError, 'boom'):
+            enqueue(explode)
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_at_once(self):
+        self.client.post(reverse('new_post'), {'text': 'сразу в индексе'})
+        self.assertFalse(Task.objects.exists())
+        self.assertTrue(SearchEntry.objects.exists())
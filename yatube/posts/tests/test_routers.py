@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.cache import feed_version
+from posts.models import Post, Task
+from posts.routers import ReplicaRouter, pinned_to_primary
+from posts.signals import feeds_changed
+
+User = get_user_model()
+REPLICA = 'test_replica'
+
+
+class ReplicaRoutingTest(TestCase):
+    """Вторая база SQLite в отдельном файле играет роль отстающей реплики."""
+    databases = {'default', REPLICA}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        # реплика всегда на SQLite, чтобы тест шёл и с основной PostgreSQL
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+            'TEST': {'MIRROR': None},
+        }
+        call_command('migrate', database=REPLICA, verbosity=0)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer')
+        # bulk_create не шлёт сигналов, которые писали бы в основную базу
+        User.objects.using(REPLICA).bulk_create(
+            [User(pk=self.user.pk, username='writer')])
+        Post.objects.using(REPLICA).bulk_create(
+            [Post(text='только на реплике', author_id=self.user.pk)])
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.settings_override = override_settings(
+            DATABASE_REPLICAS=[REPLICA])
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+
+    def test_router_decisions(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Post), REPLICA)
+        self.assertEqual(router.db_for_write(Post), 'default')
+        self.assertEqual(router.db_for_read(User), 'default')
+        with pinned_to_primary():
+            self.assertEqual(router.db_for_read(Post), 'default')
+        self.assertFalse(router.allow_migrate(REPLICA, 'posts'))
+
+    def test_feed_reads_from_replica(self):
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'только на реплике')
+
+    def test_reads_stick_to_primary_after_write(self):
+        """После публикации автор видит свой пост, хотя реплика отстаёт"""
+        response = self.client.post(reverse('new_post'),
+                                    {'text': 'свежий пост'})
+        self.assertIn('use_primary', response.cookies)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'свежий пост')
+        self.assertNotContains(response, 'только на реплике')
+
+    def test_get_without_write_does_not_stick(self):
+        response = self.client.get(reverse('new_post'))
+        self.assertNotIn('use_primary', response.cookies)
+
+    @override_settings(TASKS_EAGER=True, REPLICA_LAG=30)
+    def test_feeds_are_reset_again_after_replica_lag(self):
+        """Повторный сброс лент ждёт реплику и в режиме без воркера"""
+        version = feed_version()
+        feeds_changed()
+        self.assertEqual(feed_version(), version + 1)
+        task = Task.objects.using('default').get(
+            name='posts.cache.bump_feed_version')
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertGreater(task.run_at,
+                           timezone.now() + timezone.timedelta(seconds=20))
@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from posts.models import Post, SearchEntry
+from posts.search import stem
+
+User = get_user_model()
+
+
+class StemTest(SimpleTestCase):
+    def test_russian_stemming(self):
+        """Словоформы сводятся к общей основе"""
+        cases = {'книги': 'книг', 'книгами': 'книг',
+                 'красивая': 'красив', 'красивый': 'красив',
+                 'читающий': 'чита', 'прекраснейший': 'прекрасн',
+                 'ёлки': 'елк'}
+        for word, expected in cases.items():
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchViewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.guest = Client()
+
+    def search(self, query, **params):
+        response = self.guest.get(reverse('search'), {'q': query, **params})
+        return response.context['page']
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        post = Post.objects.create(text='Читаю интересные книги',
+                                   author=self.user)
+        self.assertEqual(list(self.search('книгами')), [post])
+        post.text = 'Смотрю фильмы'
+        post.save()
+        self.assertEqual(list(self.search('книга')), [])
+        self.assertEqual(list(self.search('фильм')), [post])
+        post.delete()
+        self.assertFalse(SearchEntry.objects.exists())
+
+    def test_results_are_ranked(self):
+        """Пост с большим числом вхождений терма выше в выдаче"""
+        once = Post.objects.create(text='кошка и собака', author=self.user)
+        twice = Post.objects.create(text='кошка, кошки, кошками',
+                                    author=self.user)
+        Post.objects.create(text='собака', author=self.user)
+        self.assertEqual(list(self.search('кошке')), [twice, once])
+        self.assertEqual(list(self.search('кошка собака')), [once])
+
+    def test_results_use_cursor_pagination(self):
+        """Результаты поиска листаются курсором"""
+        posts = [Post.objects.create(text=f'пост про котов {i}',
+                                     author=self.user) for i in range(15)]
+        with self.settings(POSTS_IN_PAGE=10):
+            first = self.search('коты')
+            second = self.search('коты', after=first.next_cursor)
+        self.assertEqual(len(first), 10)
+        self.assertEqual(set(first) | set(second), set(posts))
+        self.assertFalse(second.has_next())
@@ -0,0 +1,77 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class AuthorStatsTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_post_counter(self):
+        """Счётчик постов обновляется при создании и удалении"""
+        post = Post.objects.create(text='post', author=self.author)
+        Post.objects.create(text='post', author=self.author)
+        self.assertEqual(self.stats(self.author).post_count, 2)
+        post.delete()
+        self.assertEqual(self.stats(self.author).post_count, 1)
+
+    def test_follow_counters(self):
+        """Подписка и отписка обновляют счётчики обоих пользователей"""
+        self.reader_client.get(reverse('profile_follow',
+                                       kwargs={'username': 'author'}))
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.reader_client.get(reverse('profile_unfollow',
+                                       kwargs={'username': 'author'}))
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_comment_counter(self):
+        """Счётчик комментариев хранится в посте"""
+        post = Post.objects.create(text='post', author=self.author)
+        self.reader_client.post(
+            reverse('add_comment',
+                    kwargs={'username': 'author', 'post_id': post.id}),
+            data={'text': 'comment'})
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        Comment.objects.get(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def test_profile_uses_stats(self):
+        """Профиль показывает счётчики без COUNT(*) по постам"""
+        Post.objects.create(text='post', author=self.author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(reverse('profile',
+                                                  kwargs={'username':
+                                                          'author'}))
+        self.assertEqual(response.context['count'], 1)
+        self.assertEqual(response.context['stats'].follower_count, 1)
+
+    def test_rebuild_counters(self):
+        """Команда rebuild_counters исправляет разошедшиеся счётчики"""
+        post = Post.objects.create(text='post', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='text')
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.update(post_count=42, follower_count=42)
+        Post.objects.update(comment_count=42)
+        call_command('rebuild_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
@@ -0,0 +1,123 @@
+import io
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase
+
+from posts import views
+from posts.management.commands import collect_media
+from posts.models import Post, StoredFile
+from posts.tests.utils import TempMediaMixin, make_image
+
+User = get_user_model()
+
+
+class ContentAddressedStorageTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='author')
+        self.content = make_image().read()
+
+    def post_with_image(self, name, content=None):
+        post = Post.objects.create(text=name, author=self.user)
+        post.image.save(name, ContentFile(content or self.content))
+        return post
+
+    def refcount(self, name):
+        return StoredFile.objects.get(name=name).refcount
+
+    def collect(self, *args):
+        output = io.StringIO()
+        call_command('collect_media', *args, stdout=output)
+        return output.getvalue()
+
+    def test_identical_content_is_stored_once(self):
+        """Одинаковое содержимое под разными именами — один файл"""
+        first = self.post_with_image('a.png')
+        second = self.post_with_image('b.png')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.get_name_image(),
+                         os.path.basename(first.image.name)[:64])
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(len(os.listdir(directory)), 1)
+        self.assertEqual(self.refcount(first.image.name), 2)
+
+    def test_edit_and_delete_release_references(self):
+        first = self.post_with_image('a.png')
+        second = self.post_with_image('b.png')
+        name = first.image.name
+        first.delete()
+        self.assertEqual(self.refcount(name), 1)
+        second.image.save('c.png', ContentFile(make_image(
+            size=(10, 10)).read()))
+        self.assertEqual(self.refcount(name), 0)
+        self.assertEqual(self.refcount(second.image.name), 1)
+
+    def test_collect_removes_released_files(self):
+        post = self.post_with_image('a.png')
+        name, path = post.image.name, post.image.path
+        post.delete()
+        self.assertIn('Удалено файлов: 0', self.collect())
+        self.collect('--grace=0', '--dry-run')
+        self.assertTrue(os.path.exists(path))
+        self.collect('--grace=0')
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_collect_keeps_file_retained_meanwhile(self):
+        """Файл, на который сослались после выборки, не удаляется"""
+        post = self.post_with_image('a.png')
+        name, path = post.image.name, post.image.path
+        post.delete()
+        orphans = StoredFile.objects.filter(refcount=0)
+        stored = orphans.get()
+        # параллельная загрузка того же содержимого
+        StoredFile.objects.retain(name)
+        command = collect_media.Command(stdout=io.StringIO())
+        command.dry_run = False
+        self.assertFalse(command.release_row(orphans, stored))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.refcount(name), 1)
+
+    def test_collect_keeps_referenced_files(self):
+        """Разошедшийся счётчик исправляется, файл остаётся"""
+        post = self.post_with_image('a.png')
+        StoredFile.objects.update(refcount=0)
+        self.collect('--grace=0')
+        self.assertTrue(os.path.exists(post.image.path))
+        self.assertEqual(self.refcount(post.image.name), 1)
+
+    def test_collect_removes_untracked_files(self):
+        storage = Post._meta.get_field('image').storage
+        name = storage.save('posts/lost.png', ContentFile(b'lost upload'))
+        self.collect()
+        self.assertTrue(storage.exists(name))
+        old = time.time() - 60
+        os.utime(storage.path(name), (old, old))
+        self.collect('--grace=30')
+        self.assertFalse(storage.exists(name))
+
+    def test_reused_untracked_file_is_kept(self):
+        """Старый файл, который снова загрузили, не считается брошенным"""
+        storage = Post._meta.get_field('image').storage
+        name = storage.save('posts/lost.png', ContentFile(b'lost upload'))
+        old = time.time() - 60
+        os.utime(storage.path(name), (old, old))
+        self.assertEqual(
+            storage.save('posts/again.png', ContentFile(b'lost upload')),
+            name)
+        self.collect('--grace=30')
+        self.assertTrue(storage.exists(name))
+
+    def test_hashed_media_is_cached_forever(self):
+        post = self.post_with_image('a.png')
+        request = RequestFactory().get(post.image.url)
+        response = views.media(request, post.image.name)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        with open(os.path.join(self.media_root, 'plain.txt'), 'w') as file:
+            file.write('text')
+        response = views.media(request, 'plain.txt')
+        self.assertFalse(response.has_header('Cache-Control'))
@@ -0,0 +1,18 @@
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from posts.management.commands.benchmark_templates import (LOADERS,
+                                                           templates_with)
+from posts.templating import template_names, warm_templates
+
+
+class WarmTemplatesTest(SimpleTestCase):
+    @override_settings(TEMPLATES=templates_with(LOADERS['cached']))
+    def test_all_project_templates_are_parsed(self):
+        """Прогрев кладёт в кэширующий загрузчик все шаблоны проекта"""
+        names = list(template_names())
+        self.assertIn('posts/post_item.html', names)
+        self.assertIn('signup.html', names)
+        self.assertEqual(warm_templates(), len(names))
+        loader = engines['django'].engine.template_loaders[0]
+        self.assertEqual(len(loader.get_template_cache), len(names))
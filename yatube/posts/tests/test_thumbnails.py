@@ -0,0 +1,88 @@
+import io
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+from posts.tests.utils import TempMediaMixin, make_image
+
+User = get_user_model()
+
+
+class ThumbnailTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_new_post_stores_thumbnail(self):
+        """Миниатюра строится при сохранении и хранится в посте"""
+        self.client.post(reverse('new_post'),
+                         data={'text': 'with image', 'image': make_image()})
+        post = Post.objects.get(text='with image')
+        self.assertTrue(post.thumbnail_url)
+        self.assertEqual((post.thumbnail_width, post.thumbnail_height),
+                         (960, 339))
+
+    def test_edit_replaces_thumbnail(self):
+        """Новая картинка при редактировании получает новую миниатюру"""
+        self.client.post(reverse('new_post'),
+                         data={'text': 'with image', 'image': make_image()})
+        post = Post.objects.get(text='with image')
+        old_url = post.thumbnail_url
+        self.client.post(
+            reverse('post_edit', kwargs={'username': 'author',
+                                         'post_id': post.id}),
+            data={'text': 'edited', 'image': make_image('other.png',
+                                                        (600, 400))})
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail_url)
+        self.assertNotEqual(post.thumbnail_url, old_url)
+
+    def test_feed_does_not_touch_thumbnail_store(self):
+        """Лента не обращается к хранилищу миниатюр sorl"""
+        self.client.post(reverse('new_post'),
+                         data={'text': 'with image', 'image': make_image()})
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('index'))
+        post = Post.objects.get(text='with image')
+        self.assertTrue(post.thumbnail_url)
+        self.assertContains(response, post.thumbnail_url)
+        self.assertFalse([query for query in queries
+                          if 'thumbnail_kvstore' in query['sql']])
+
+    def test_thumbnail_set_and_srcset(self):
+        """Набор ширин хранится в посте и попадает в srcset карточки"""
+        self.client.post(reverse('new_post'),
+                         data={'text': 'with image', 'image': make_image()})
+        post = Post.objects.get(text='with image')
+        self.assertEqual([(t['width'], t['height']) for t in post.thumbnails],
+                         [(320, 113), (480, 170), (640, 226), (960, 339)])
+        self.assertEqual(post.thumbnail_url, post.thumbnails[-1]['url'])
+        response = self.client.get(reverse('index'))
+        srcset = ', '.join(f"{t['url']} {t['width']}w"
+                           for t in post.thumbnails)
+        self.assertContains(response, f'srcset="{srcset}"')
+        self.assertContains(response, 'sizes="(min-width: 992px)')
+
+    def test_small_image_is_not_upscaled(self):
+        self.client.post(reverse('new_post'),
+                         data={'text': 'small', 'image': make_image(
+                             size=(500, 400))})
+        widths = [t['width'] for t in Post.objects.get().thumbnails]
+        self.assertEqual(widths, [320, 480, 500])
+
+    def test_backfill_command(self):
+        self.client.post(reverse('new_post'),
+                         data={'text': 'with image', 'image': make_image()})
+        Post.objects.update(thumbnail_manifest='')
+        call_command('generate_thumbnails', processes=0,
+                     stdout=io.StringIO())
+        self.assertEqual(len(Post.objects.get().thumbnails), 4)
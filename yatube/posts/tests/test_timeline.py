@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def follow(self):
+        self.reader_client.get(reverse('profile_follow',
+                                       kwargs={'username': 'author'}))
+
+    def feed(self):
+        response = self.reader_client.get(reverse('follow_index'))
+        return list(response.context['page'])
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост раздаётся в ленты подписчиков при записи"""
+        self.follow()
+        self.author_client.post(reverse('new_post'), data={'text': 'fresh'})
+        post = Post.objects.get(text='fresh')
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader,
+                                                     post=post).exists())
+        self.assertEqual(self.feed(), [post])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дозаполняет ленту, отписка очищает её"""
+        posts = [Post.objects.create(text=f'old {i}', author=self.author)
+                 for i in range(3)]
+        self.follow()
+        self.assertEqual(set(self.feed()), set(posts))
+        self.reader_client.get(reverse('profile_unfollow',
+                                       kwargs={'username': 'author'}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_celebrity_posts_are_read_on_demand(self):
+        """Посты автора с множеством подписчиков не раздаются при записи"""
+        self.follow()
+        with self.settings(TIMELINE_FANOUT_LIMIT=0):
+            post = Post.objects.create(text='celebrity', author=self.author)
+            self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+            self.assertIn(post, self.feed())
+
+    def test_former_celebrity_posts_are_fanned_out(self):
+        """Посты, написанные выше порога, остаются в ленте под порогом"""
+        fan = User.objects.create_user(username='fan')
+        fan_client = Client()
+        fan_client.force_login(fan)
+        self.follow()
+        fan_client.get(reverse('profile_follow',
+                               kwargs={'username': 'author'}))
+        with self.settings(TIMELINE_FANOUT_LIMIT=1):
+            post = Post.objects.create(text='celebrity', author=self.author)
+            self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+            fan_client.get(reverse('profile_unfollow',
+                                   kwargs={'username': 'author'}))
+            self.assertTrue(TimelineEntry.objects.filter(
+                user=self.reader, post=post).exists())
+            self.assertIn(post, self.feed())
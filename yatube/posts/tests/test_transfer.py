@@ -0,0 +1,102 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import (AuthorStats, Comment, Follow, Group, Post,
+                          SearchEntry, TimelineEntry)
+
+User = get_user_model()
+OLD_DATE = datetime(2015, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(title='Книги', slug='books',
+                                          description='о книгах')
+        self.post = Post.objects.create(text='Старая запись о книгах',
+                                        author=self.author,
+                                        group=self.group)
+        Post.objects.filter(pk=self.post.pk).update(pub_date=OLD_DATE)
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Отличная запись')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def export(self, model, fmt='jsonl'):
+        path = os.path.join(self.directory, f'{model}.{fmt}')
+        call_command('export_data', model, format=fmt, output=path,
+                     stderr=io.StringIO())
+        return path
+
+    def import_(self, model, path, **options):
+        call_command('import_data', model, path, stdout=io.StringIO(),
+                     **options)
+
+    def roundtrip(self, fmt):
+        paths = {model: self.export(model, fmt)
+                 for model in ('groups', 'posts', 'comments', 'follows')}
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        Follow.objects.all().delete()
+        for model, path in paths.items():
+            self.import_(model, path)
+
+    def test_jsonl_roundtrip(self):
+        """Выгрузка и загрузка сохраняют данные, даты и производные"""
+        self.roundtrip('jsonl')
+        post = Post.objects.get()
+        self.assertEqual(post.pk, self.post.pk)
+        self.assertEqual(post.pub_date, OLD_DATE)
+        self.assertEqual(post.group.slug, 'books')
+        self.assertEqual(post.comment_count, 1)
+        self.assertTrue(Follow.objects.filter(user=self.reader,
+                                              author=self.author).exists())
+        self.assertEqual(AuthorStats.objects.get(user=self.author).post_count,
+                         1)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.reader,
+                                                     post=post).exists())
+        self.assertTrue(SearchEntry.objects.filter(post=post).exists())
+
+    def test_csv_roundtrip(self):
+        self.roundtrip('csv')
+        post = Post.objects.get()
+        self.assertEqual(post.pub_date, OLD_DATE)
+        self.assertEqual(post.comments.get().text, 'Отличная запись')
+
+    def test_repeated_import_skips_existing_rows(self):
+        path = self.export('posts')
+        self.import_('posts', path)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def write(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as stream:
+            for row in rows:
+                stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def test_unknown_users(self):
+        """Строки неизвестных авторов пропускаются или создают автора"""
+        rows = [{'text': f'пост {i}', 'author': 'stranger'}
+                for i in range(3)]
+        path = self.write('posts.jsonl', rows)
+        self.import_('posts', path, batch_size=2)
+        self.assertFalse(Post.objects.filter(author__username='stranger')
+                         .exists())
+        self.import_('posts', path, batch_size=2, create_users=True)
+        stranger = User.objects.get(username='stranger')
+        self.assertEqual(stranger.posts.count(), 3)
+        self.assertFalse(stranger.has_usable_password())
+        self.assertIsNotNone(stranger.posts.first().pub_date)
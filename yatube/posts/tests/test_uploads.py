@@ -0,0 +1,111 @@
+import io
+import struct
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post, StoredFile
+from posts.storage import content_hash_of
+from posts.tasks import optimize_image
+from posts.tests.utils import TempMediaMixin, make_image
+
+User = get_user_model()
+
+
+def png_header(width, height):
+    """Начало PNG с заданными размерами и почти без данных пикселей."""
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b'\0' * 1024)))
+
+
+def make_photo(name='photo.jpg'):
+    buffer = io.BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera maker'
+    Image.new('RGB', (300, 200), 'blue').save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/jpeg')
+
+
+class ImageUploadTest(TempMediaMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def publish(self, image):
+        return self.client.post(reverse('new_post'),
+                                data={'text': 'с картинкой', 'image': image})
+
+    def assertRejected(self, response, message):
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(message, response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=1024)
+    def test_large_file_is_rejected(self):
+        self.assertRejected(self.publish(make_image()), 'Файл больше')
+
+    @override_settings(IMAGE_MAX_PIXELS=100 * 100)
+    def test_dimensions_are_checked_by_header(self):
+        self.assertRejected(self.publish(make_image(size=(200, 200))),
+                            'слишком много точек')
+
+    def test_decompression_bomb_is_rejected_before_decoding(self):
+        """Заголовок на 10⁹ точек отклоняется, пиксели не декодируются"""
+        bomb = SimpleUploadedFile('bomb.png', png_header(40000, 40000),
+                                  content_type='image/png')
+        self.assertRejected(self.publish(bomb), 'точек')
+
+    def test_photo_is_reencoded_without_metadata(self):
+        """Фото заменяется прогрессивным JPEG без EXIF, исходник отпущен"""
+        self.publish(make_photo())
+        post = Post.objects.get()
+        original = f'posts/{post.image_hash[:2]}/{post.image_hash}.jpg'
+        self.assertNotEqual(post.image.name, original)
+        self.assertEqual(StoredFile.objects.get(name=original).refcount, 0)
+        self.assertEqual(
+            StoredFile.objects.get(name=post.image.name).refcount, 1)
+        with Image.open(post.image.path) as image:
+            self.assertNotIn('exif', image.info)
+            self.assertTrue(image.info.get('progressive'))
+            self.assertEqual(image.size, (300, 200))
+
+    def test_image_replaced_during_reencoding_is_kept(self):
+        """Правка поста во время перекодирования не теряет ссылок"""
+        post = Post.objects.create(text='с картинкой', author=self.user)
+        post.image.save('photo.jpg', ContentFile(make_photo().read()))
+        original = post.image.name
+        Post.objects.filter(pk=post.pk).update(
+            image_hash=content_hash_of(original))
+        stale = Post.objects.only('image', 'image_hash').get(pk=post.pk)
+        post.image.save('other.png', ContentFile(make_image().read()))
+        optimize_image(stale)
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, original)
+        self.assertEqual(StoredFile.objects.get(name=original).refcount, 0)
+        self.assertEqual(
+            StoredFile.objects.get(name=post.image.name).refcount, 1)
+        self.assertEqual(StoredFile.objects.count(), 2)
+
+    def test_transparent_image_becomes_webp(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (50, 50), (255, 0, 0, 128)).save(buffer, 'PNG')
+        self.publish(SimpleUploadedFile('alpha.png', buffer.getvalue(),
+                                        content_type='image/png'))
+        post = Post.objects.get()
+        self.assertEqual(post.image_mime, 'image/webp')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertIn('A', image.mode)
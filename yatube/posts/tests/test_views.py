@@ -1,7 +1,10 @@
 from django import forms
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Comment, Follow, Group, Post
@@ -108,7 +111,7 @@ class PostPagesTests(TestCase):
         response = self.authorized_client.get(reverse('profile',
                                                       kwargs=parameter))
         context_profile = {'author': post_test.author,
-                           'count': self.user.posts.count}
+                           'count': self.user.posts.count()}
         self.assertEqual(response.context['author'], context_profile['author'])
         self.assertEqual(response.context['count'], context_profile['count'])
         post_image = response.context['page'][0]
@@ -140,7 +143,7 @@ class PostPagesTests(TestCase):
         response = self.authorized_client.get(reverse('post',
                                               kwargs=parameters))
         context_post_view = {'author': self.user, 'post': post_test,
-                             'count': self.user.posts.count}
+                             'count': self.user.posts.count()}
         for context in context_post_view:
             self.assertEqual(response.context[context],
                              context_post_view[context])
@@ -236,3 +239,46 @@ class PostPagesTests(TestCase):
         response = self.authorized_client.get(reverse('profile_follow',
                                                       kwargs=parameter))
         self.assertRedirects(response, reverse('follow_index'))
+
+
+class FeedQueryCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='testGroup',
+                                         slug='test',
+                                         description='group for testing')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(30):
+            post = Post.objects.create(text=f'post {i}',
+                                       author=cls.author,
+                                       group=cls.group)
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text='comment')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def count_queries(self, url, per_page):
+        cache.clear()
+        with self.settings(POSTS_IN_PAGE=per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        self.assertEqual(len(response.context['page']), per_page)
+        return len(queries)
+
+    def test_feed_query_budget_does_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от размера страницы"""
+        urls = (reverse('index'),
+                reverse('group_posts', kwargs={'slug': 'test'}),
+                reverse('profile', kwargs={'username': 'author'}),
+                reverse('follow_index'))
+        for url in urls:
+            with self.subTest(url=url):
+                small = self.count_queries(url, 5)
+                large = self.count_queries(url, 25)
+                self.assertEqual(small, large)
+                self.assertLessEqual(large, 10)
@@ -0,0 +1,59 @@
+import json
+
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from . import metrics
+from .cache import bump_feed_version
+from .models import Post
+
+
+def clear_thumbnail(post):
+    post.thumbnail_url = ''
+    post.thumbnail_width = None
+    post.thumbnail_height = None
+    post.thumbnail_manifest = ''
+
+
+def thumbnail_geometries():
+    """Геометрии набора: ширины ``POST_THUMBNAIL_WIDTHS`` в пропорциях
+    ``POST_THUMBNAIL_GEOMETRY``, от меньшей к большей."""
+    width, height = map(int, settings.POST_THUMBNAIL_GEOMETRY.split('x'))
+    return [f'{size}x{round(size * height / width)}'
+            for size in sorted(settings.POST_THUMBNAIL_WIDTHS)]
+
+
+def build_thumbnails(image):
+    """Миниатюры всех ширин, не больше самой картинки."""
+    manifest = []
+    for geometry in thumbnail_geometries():
+        thumbnail = get_thumbnail(image, geometry, crop='center',
+                                  upscale=False)
+        # картинка кончилась: большие ширины дали бы тот же файл
+        if manifest and thumbnail.width <= manifest[-1]['width']:
+            break
+        manifest.append({'width': thumbnail.width,
+                         'height': thumbnail.height,
+                         'url': thumbnail.url})
+    return manifest
+
+
+def generate_thumbnail(post_id):
+    """Строит набор миниатюр и сохраняет его в посте; самая большая
+    служит обычным ``src``."""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return
+    with metrics.timed('thumbnail'):
+        manifest = build_thumbnails(post.image)
+    largest = manifest[-1]
+    # картинку могли заменить, пока строились миниатюры
+    updated = Post.objects.filter(
+        pk=post_id, image=post.image.name).bump_card_version(
+        thumbnail_url=largest['url'],
+        thumbnail_width=largest['width'],
+        thumbnail_height=largest['height'],
+        thumbnail_manifest=json.dumps(manifest))
+    # update() не шлёт сигналов, а ленты и ETag должны увидеть миниатюру
+    if updated:
+        bump_feed_version()
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db.models import Q
+
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+
+def is_celebrity(author_id):
+    """У автора слишком много подписчиков для раздачи при записи."""
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        follower_count__gt=settings.TIMELINE_FANOUT_LIMIT).exists()
+
+
+def fan_out(post):
+    if is_celebrity(post.author_id):
+        return
+    followers = (Follow.objects.filter(author_id=post.author_id,
+                                       user__isnull=False)
+                 .values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post) for user_id in followers),
+        batch_size=settings.TIMELINE_BATCH_SIZE, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    if is_celebrity(author_id):
+        return
+    posts = (Post.objects.filter(author_id=author_id)
+             .values_list('pk', flat=True))
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id)
+         for post_id in posts.iterator()),
+        batch_size=settings.TIMELINE_BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_author(author_id):
+    """Раздаёт посты автора всем подписчикам.
+
+    Пока автор был «знаменитостью», его посты не раздавались, а читались
+    при чтении ленты; под порогом их нужно положить в ленты.
+    """
+    if is_celebrity(author_id):
+        return
+    followers = (Follow.objects.filter(author_id=author_id,
+                                       user__isnull=False)
+                 .values_list('user_id', flat=True))
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id,
+                                 post__author_id=author_id).delete()
+
+
+def timeline_posts(user):
+    """Посты авторов, на которых подписан ``user``.
+
+    Обычные авторы читаются из материализованной ленты, посты
+    «знаменитостей» — напрямую (раздача при чтении).
+    """
+    condition = Q(pk__in=TimelineEntry.objects.filter(user=user)
+                  .values('post'))
+    celebrities = list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__follower_count__gt=settings.TIMELINE_FANOUT_LIMIT)
+        .values_list('author_id', flat=True))
+    if celebrities:
+        condition |= Q(author_id__in=celebrities)
+    return Post.objects.for_feed().filter(condition)
@@ -0,0 +1,237 @@
+"""Потоковый импорт и экспорт постов, комментариев, групп и подписок.
+
+Пользователи, группы и посты в файлах указываются по ``username``,
+``slug`` и ``id``, поэтому выгрузку можно загрузить в другую базу.
+Память постоянна: строки читаются и пишутся пачками по ``batch_size``.
+"""
+import csv
+import json
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post, User
+
+FORMATS = ('jsonl', 'csv')
+
+
+class Resolver:
+    """Переводит ``username`` и ``slug`` пачки в первичные ключи."""
+
+    def __init__(self, create_users=False):
+        self.create_users = create_users
+
+    def users(self, names):
+        names = {name for name in names if name}
+        found = dict(User.objects.filter(username__in=names)
+                     .values_list('username', 'pk'))
+        missing = names - found.keys()
+        if missing and self.create_users:
+            User.objects.bulk_create(
+                (User(username=name, password=make_password(None))
+                 for name in missing), ignore_conflicts=True)
+            found.update(User.objects.filter(username__in=missing)
+                         .values_list('username', 'pk'))
+        return found
+
+    def groups(self, slugs):
+        return dict(Group.objects.filter(slug__in={slug for slug in slugs
+                                                   if slug})
+                    .values_list('slug', 'pk'))
+
+    def posts(self, ids):
+        return set(Post.objects.filter(pk__in={int(pk) for pk in ids if pk})
+                   .values_list('pk', flat=True))
+
+
+def _date(value):
+    return parse_datetime(value) if value else None
+
+
+def _id(value):
+    return int(value) if value not in (None, '') else None
+
+
+class Spec:
+    """Описание выгрузки одной модели: поля файла и сборка объектов."""
+    model = None
+    fields = ()
+    values = ()
+
+    def export_queryset(self):
+        return (self.model.objects.order_by('pk')
+                .values_list(*self.values))
+
+    def build(self, rows, resolver):
+        raise NotImplementedError
+
+
+class GroupSpec(Spec):
+    model = Group
+    fields = values = ('slug', 'title', 'description')
+
+    def build(self, rows, resolver):
+        return [Group(slug=row['slug'], title=row['title'],
+                      description=row.get('description') or '')
+                for row in rows]
+
+
+class PostSpec(Spec):
+    model = Post
+    fields = ('id', 'text', 'pub_date', 'author', 'group', 'image')
+    values = ('pk', 'text', 'pub_date', 'author__username', 'group__slug',
+              'image')
+
+    def build(self, rows, resolver):
+        authors = resolver.users(row['author'] for row in rows)
+        groups = resolver.groups(row.get('group') for row in rows)
+        return [Post(pk=_id(row.get('id')), text=row['text'],
+                     pub_date=_date(row.get('pub_date')),
+                     author_id=authors[row['author']],
+                     group_id=groups.get(row.get('group')),
+                     image=row.get('image') or '')
+                for row in rows if row['author'] in authors]
+
+
+class CommentSpec(Spec):
+    model = Comment
+    fields = ('id', 'post', 'author', 'text', 'created')
+    values = ('pk', 'post_id', 'author__username', 'text', 'created')
+
+    def build(self, rows, resolver):
+        authors = resolver.users(row['author'] for row in rows)
+        posts = resolver.posts(row['post'] for row in rows)
+        return [Comment(pk=_id(row.get('id')), post_id=int(row['post']),
+                        author_id=authors[row['author']], text=row['text'],
+                        created=_date(row.get('created')))
+                for row in rows
+                if row['author'] in authors and int(row['post']) in posts]
+
+
+class FollowSpec(Spec):
+    model = Follow
+    fields = ('user', 'author')
+    values = ('user__username', 'author__username')
+
+    def export_queryset(self):
+        return super().export_queryset().filter(user__isnull=False,
+                                                author__isnull=False)
+
+    def build(self, rows, resolver):
+        users = resolver.users(name for row in rows
+                               for name in (row['user'], row['author']))
+        return [Follow(user_id=users[row['user']],
+                       author_id=users[row['author']])
+                for row in rows
+                if row['user'] in users and row['author'] in users
+                and row['user'] != row['author']]
+
+
+SPECS = {
+    'groups': GroupSpec(),
+    'posts': PostSpec(),
+    'comments': CommentSpec(),
+    'follows': FollowSpec(),
+}
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+@contextmanager
+def keep_dates(model):
+    """Не даёт ``auto_now_add`` затереть даты из файла при вставке."""
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _fill_dates(objects, model):
+    # пустая дата в файле означает «сейчас», как при обычном сохранении
+    for field in model._meta.concrete_fields:
+        if not getattr(field, 'auto_now_add', False):
+            continue
+        for obj in objects:
+            if getattr(obj, field.attname) is None:
+                field.pre_save(obj, add=True)
+
+
+def import_rows(name, rows, batch_size, create_users=False):
+    """Загружает строки пачками; каждая пачка — своя транзакция.
+
+    Возвращает число прочитанных и переданных в базу строк. Уже
+    существующие записи (те же ``id``, ``slug`` или пара подписки)
+    пропускаются, поэтому загрузку можно повторить после сбоя.
+    """
+    spec = SPECS[name]
+    resolver = Resolver(create_users)
+    read = written = 0
+    for batch in batches(rows, batch_size):
+        objects = spec.build(batch, resolver)
+        _fill_dates(objects, spec.model)
+        with transaction.atomic(), keep_dates(spec.model):
+            spec.model.objects.bulk_create(objects, batch_size=batch_size,
+                                           ignore_conflicts=True)
+        read += len(batch)
+        written += len(objects)
+    reset_sequences(spec.model)
+    return read, written
+
+
+def reset_sequences(model):
+    """После вставки с явными ``id`` сдвигает последовательность PostgreSQL."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def _serialize(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_rows(name, chunk_size):
+    spec = SPECS[name]
+    for values in spec.export_queryset().iterator(chunk_size=chunk_size):
+        yield dict(zip(spec.fields, map(_serialize, values)))
+
+
+def write_rows(stream, fmt, name, rows):
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=SPECS[name].fields)
+        writer.writeheader()
+    for row in rows:
+        if fmt == 'csv':
+            writer.writerow(row)
+        else:
+            stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+        count += 1
+    return count
@@ -0,0 +1,77 @@
+"""Приём загружаемых картинок.
+
+Файл пишется во временный файл на диске кусками, не целиком в память.
+Загрузка отбрасывается, как только она превысила допустимый объём или
+заголовок картинки показал слишком большие размеры: остаток запроса
+читается, но никуда не пишется и не декодируется.
+"""
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+
+from .images import HEADER_LIMIT, header_size, size_error
+
+
+class RejectedUpload(SimpleUploadedFile):
+    """Пустая замена отклонённого файла: форма покажет ``upload_error``."""
+
+    def __init__(self, name, content_type, error):
+        super().__init__(name, b'', content_type)
+        self.upload_error = error
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.head = b''
+        self.received = 0
+        self.error = None
+        if (self.content_length
+                and self.content_length > settings.IMAGE_UPLOAD_MAX_SIZE):
+            self.reject(self.too_large())
+
+    def too_large(self):
+        megabytes = settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)
+        return f'Файл больше {megabytes} МБ'
+
+    def reject(self, error):
+        self.error = error
+        # временный файл удаляется при закрытии
+        self.file.close()
+
+    def check_header(self, raw_data):
+        self.head += raw_data
+        try:
+            width, height = header_size(self.head)
+        except Image.DecompressionBombError:
+            self.head = None
+            self.reject('В картинке слишком много точек')
+            return
+        except (OSError, SyntaxError):
+            if len(self.head) > HEADER_LIMIT:
+                self.head = None
+            return
+        self.head = None
+        error = size_error(width, height)
+        if error:
+            self.reject(error)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.reject(self.too_large())
+            return None
+        if self.head is not None:
+            self.check_header(raw_data)
+            if self.error:
+                return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.error:
+            return RejectedUpload(self.file_name, self.content_type,
+                                  self.error)
+        return super().file_complete(file_size)
@@ -1,17 +1,28 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.index, name="index"),
     path("group/<slug:slug>/", views.group_posts, name="group_posts"),
     path("new/", views.new_post, name="new_post"),
+    path("search/", views.search, name="search"),
+    path("metrics/", views.metrics_view, name="metrics"),
+    path("api/posts/", api.index, name="api_index"),
+    path("api/group/<slug:slug>/", api.group_posts, name="api_group_posts"),
+    path("api/follow/", api.follow_index, name="api_follow_index"),
+    path("api/users/<str:username>/posts/", api.profile,
+         name="api_profile"),
+    path("api/users/<str:username>/posts/<int:post_id>/", api.post_view,
+         name="api_post"),
     path("/404/", views.page_not_found, name="404"),
     path("/500/", views.server_error, name="500"),
     path("<str:username>/<int:post_id>/edit/",
          views.post_edit, name="post_edit"),
     path("<str:username>/<int:post_id>/comment",
          views.add_comment, name="add_comment"),
+    path("<str:username>/<int:post_id>/comments/",
+         views.post_comments, name="post_comments"),
     path("<str:username>/<int:post_id>/", views.post_view, name="post"),
     path("follow/", views.follow_index, name="follow_index"),
     path("<str:username>/", views.profile, name="profile"),
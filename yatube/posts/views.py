@@ -2,11 +2,25 @@ from datetime import datetime as dt
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import etag
+from django.views.static import serve
 
+from . import metrics
+from .cache import cached_count, feed_cache_context, page_etag
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import AuthorStats, Follow, Group, Post, User
+from .paginators import CountedPaginator, CursorPaginator, InvalidCursor
+from .routers import use_primary
+from .search import search_posts
+from .storage import content_hash_of
+from .queue import enqueue
+from .tasks import process_image
+from .thumbnails import clear_thumbnail
+from .timeline import timeline_posts
 
 
 def get_page(request, paginator):
@@ -16,50 +30,118 @@ def get_page(request, paginator):
     return paginator.get_page(page_number)
 
 
+def paginate(request, posts, count):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if settings.POSTS_CURSOR_PAGINATION or after or before:
+        paginator = CursorPaginator(posts, settings.POSTS_IN_PAGE)
+        return paginator.get_cursor_page(after=after, before=before)
+    paginator = CountedPaginator(posts, settings.POSTS_IN_PAGE, count)
+    return get_page(request, paginator)
+
+
+@etag(page_etag)
 def index(request):
-    latest = Post.objects.all()
-    paginator = Paginator(latest, settings.POSTS_IN_PAGE)
-    page = get_page(request, paginator)
-    return render(request, "posts/index.html", {"page": page, })
+    latest = Post.objects.for_feed()
+    page = paginate(request, latest,
+                    lambda: cached_count("all", Post.objects))
+    return render(request, "posts/index.html",
+                  {"page": page,
+                   **feed_cache_context(request, "index")})
 
 
+@etag(page_etag)
 def group_posts(request, slug="example"):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, settings.POSTS_IN_PAGE)
-    page = get_page(request, paginator)
+    posts = group.posts.for_feed()
+    page = paginate(request, posts,
+                    lambda: cached_count(f"group:{group.pk}", group.posts))
     return render(request, "posts/group.html",
-                  {"group": group, "page": page, })
+                  {"group": group, "page": page,
+                   **feed_cache_context(request, "group", group.pk)})
 
 
+@etag(page_etag)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, settings.POSTS_IN_PAGE)
-    page = get_page(request, paginator)
+    posts = author.posts.for_feed()
+    stats = AuthorStats.objects.for_user(author)
+    page = paginate(request, posts, stats.post_count)
     following = False
     if request.user.is_authenticated:
         following = Follow.objects.filter(user=request.user,
                                           author__username=username).exists()
     return render(request, "posts/profile.html",
                   {"author": author, "page": page,
-                   "count": author.posts.count,
-                   "following": following, })
+                   "stats": stats,
+                   "count": stats.post_count,
+                   "following": following,
+                   **feed_cache_context(request, "profile", author.pk)})
+
+
+def comment_paginator(post):
+    return CursorPaginator(post.comments.select_related("author"),
+                           settings.COMMENTS_IN_PAGE,
+                           ordering=("-created", "-id"))
 
 
+@etag(page_etag)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
-    count = post.author.posts.count
+    post = get_object_or_404(Post.objects.for_feed(),
+                             author__username=username, id=post_id)
+    stats = AuthorStats.objects.for_user(post.author)
     form = CommentForm(request.POST)
-    comments = post.comments.all()
+    comments = comment_paginator(post).get_cursor_page(
+        after=request.GET.get("after"))
     return render(request, "posts/post.html",
                   {"author": post.author, "post": post,
-                   "count": count,
+                   "stats": stats,
+                   "count": stats.post_count,
                    "form": form,
                    "comments": comments})
 
 
+@etag(page_etag)
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев для догрузки на странице поста."""
+    post = get_object_or_404(Post.objects.only("id"),
+                             author__username=username, id=post_id)
+    try:
+        comments = comment_paginator(post).cursor_page(
+            after=request.GET.get("after"))
+    except InvalidCursor:
+        return HttpResponseBadRequest()
+    return render(request, "posts/comment_list.html",
+                  {"username": username, "post": post,
+                   "comments": comments})
+
+
+def search(request):
+    query = request.GET.get("q", "").strip()
+    paginator = CursorPaginator(search_posts(query), settings.POSTS_IN_PAGE,
+                                ordering=("-rank", "-id"))
+    page = paginator.get_cursor_page(after=request.GET.get("after"),
+                                     before=request.GET.get("before"))
+    return render(request, "posts/search.html",
+                  {"page": page, "query": query, })
+
+
+def metrics_view(request):
+    token = settings.METRICS_TOKEN
+    authorized = (settings.DEBUG or request.user.is_staff
+                  or token and request.META.get('HTTP_AUTHORIZATION')
+                  == f'Bearer {token}')
+    if not authorized:
+        raise Http404
+    if request.GET.get("format") == "json":
+        return HttpResponse(metrics.to_json(metrics.registry.snapshot()),
+                            content_type="application/json")
+    return HttpResponse(metrics.to_prometheus(metrics.registry.totals()),
+                        content_type="text/plain; version=0.0.4")
+
+
 @login_required()
+@use_primary
 def new_post(request):
     if request.method != 'POST':
         form = PostForm()
@@ -70,7 +152,10 @@ def new_post(request):
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
-        new_post.save()
+        with transaction.atomic():
+            new_post.save()
+            if new_post.image:
+                enqueue(process_image, new_post.pk)
         return redirect(index)
     return render(request, "posts/new.html",
                   {"form": form, "operation": "Добавить запись",
@@ -78,6 +163,7 @@ def new_post(request):
 
 
 @login_required()
+@use_primary
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
 
@@ -95,13 +181,28 @@ def post_edit(request, username, post_id):
     if form.is_valid():
         post = form.save(commit=False)
         post.pub_date = dt.today()
-        post.save()
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            clear_thumbnail(post)
+        with transaction.atomic():
+            post.save()
+            if image_changed and post.image:
+                enqueue(process_image, post.pk)
         return redirect(post_view, post.author, post.id)
     return render(request, "posts/new.html",
                   {"form": form, "operation": "Редактировать запись",
                    "add_or_save": "Сохранить", "post": post})
 
 
+def media(request, path):
+    """Раздача MEDIA_ROOT при разработке; картинки по хэшу неизменяемы."""
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if content_hash_of(path):
+        patch_cache_control(response, public=True, immutable=True,
+                            max_age=settings.MEDIA_MAX_AGE)
+    return response
+
+
 def page_not_found(request, exception):
     return render(request, "misc/404.html",
                   {"path": request.path},
@@ -113,6 +214,7 @@ def server_error(request):
 
 
 @login_required()
+@use_primary
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, id=post_id)
     if request.method != 'POST':
@@ -123,30 +225,38 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.post = post
         comment.author = request.user
-        comment.save()
+        with transaction.atomic():
+            comment.save()
         return redirect(post_view, username, post_id)
     return render(request, 'posts/comments.html', {'form': form})
 
 
 @login_required
+@etag(page_etag)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, settings.POSTS_IN_PAGE)
-    page = get_page(request, paginator)
-    return render(request, "posts/follow.html", {"page": page, })
+    posts = timeline_posts(request.user)
+    page = paginate(request, posts,
+                    lambda: cached_count(f"follow:{request.user.pk}", posts))
+    return render(request, "posts/follow.html",
+                  {"page": page,
+                   **feed_cache_context(request, "follow")})
 
 
 @login_required
+@use_primary
 def profile_follow(request, username):
     user = get_object_or_404(User, username=username)
     if request.user == user:
         return redirect(follow_index)
-    Follow.objects.get_or_create(user=request.user,
-                                 author=user)
+    with transaction.atomic():
+        Follow.objects.get_or_create(user=request.user,
+                                     author=user)
     return redirect(follow_index)
 
 
 @login_required
+@use_primary
 def profile_unfollow(request, username):
-    request.user.follower.get(author__username=username).delete()
+    with transaction.atomic():
+        request.user.follower.get(author__username=username).delete()
     return redirect(follow_index)
@@ -1,4 +1,6 @@
 import os
+import sys
+
 from dotenv import load_dotenv
 
 
@@ -8,9 +10,26 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 POSTS_IN_PAGE = 10
 
+# Комментариев на странице поста и в каждой догружаемой порции
+COMMENTS_IN_PAGE = 20
+
+POSTS_CURSOR_PAGINATION = False
+
+# Наибольший размер страницы JSON API (?limit=)
+API_MAX_PAGE_SIZE = 1000
+
+# Авторы с большим числом подписчиков не раздаются в ленты при записи,
+# их посты подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+TIMELINE_BATCH_SIZE = 500
+
 SECRET_KEY = os.getenv('KEY')
 
-DEBUG = True
+# DJANGO_ENV=production: без отладки, с кэширующим загрузчиком шаблонов,
+# разобранных заранее при старте воркера
+PRODUCTION = os.getenv('DJANGO_ENV') == 'production'
+
+DEBUG = not PRODUCTION
 
 ALLOWED_HOSTS = [
     "localhost",
@@ -42,42 +61,95 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.routers.PrimaryStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.metrics.MetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени отрисовки для /metrics/
+        'BACKEND': 'posts.metrics.TimedTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
+        'APP_DIRS': not PRODUCTION,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'posts.context_processors.post_cards',
             ],
         },
     },
 ]
 
+if PRODUCTION:
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
+TEMPLATES_WARM_UP = PRODUCTION
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# База выбирается переменными окружения. SQLite работает в режиме WAL
+# (см. posts.signals.configure_sqlite): читатели не ждут пишущих.
+# Для PostgreSQL за pgbouncer в режиме transaction нужен DB_PGBOUNCER=1.
+DATABASE_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'OPTIONS': {'timeout': int(os.getenv('DB_TIMEOUT', 20))},
+    },
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_NAME', 'yatube'),
+        'USER': os.getenv('DB_USER', 'yatube'),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', 'localhost'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+        'DISABLE_SERVER_SIDE_CURSORS': bool(os.getenv('DB_PGBOUNCER')),
+    },
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        **DATABASE_PROFILES[os.getenv('DB_ENGINE', 'sqlite')],
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# Реплики для чтения лент: пути к файлам SQLite или хосты PostgreSQL
+# через запятую. После записи пользователь REPLICA_LAG секунд читает
+# из основной базы.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{number}'
+    location_key = ('NAME' if DATABASES['default']['ENGINE'].endswith(
+        'sqlite3') else 'HOST')
+    DATABASES[alias] = {**DATABASES['default'],
+                        location_key: location.strip(),
+                        'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['posts.routers.ReplicaRouter']
+REPLICA_LAG = int(os.getenv('DB_REPLICA_LAG', 5))
+REPLICA_STICKY_COOKIE = 'use_primary'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -113,8 +185,77 @@ STATIC_ROOT = os.path.join('/yatube', 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Картинки постов лежат по хэшу содержимого и не меняются: их адреса
+# кэшируются на год. Файлы без ссылок удаляет collect_media, но не раньше
+# чем через MEDIA_GC_GRACE секунд.
+MEDIA_MAX_AGE = 60 * 60 * 24 * 365
+MEDIA_GC_GRACE = 60 * 60 * 24
+
+# Загрузки пишутся на диск кусками и отклоняются по объёму и размерам из
+# заголовка картинки до полного чтения и декодирования
+FILE_UPLOAD_HANDLERS = ['posts.uploads.ImageUploadHandler']
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_SIDE = 10000
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+# Качество JPEG и WebP при перекодировании загруженных картинок
+IMAGE_QUALITY = 85
+
+# Миниатюры строятся в фоне после сохранения поста, а не при рендере:
+# набор ширин в пропорциях POST_THUMBNAIL_GEOMETRY для srcset, sizes —
+# ширина карточки на экране
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_THUMBNAIL_WIDTHS = (320, 480, 640, 960)
+POST_THUMBNAIL_SIZES = '(min-width: 992px) 960px, 100vw'
+
+# Обработка картинок, раздача постов в ленты и поисковый индекс пишутся
+# в очередь и выполняются командой run_tasks. Без production задачи
+# выполняются сразу, в запросе: для разработки и тестов воркер не нужен.
+# С репликами воркер нужен всегда: повторный сброс кэша лент отложен до
+# того, как они догонят основную базу.
+TASKS_EAGER = os.getenv(
+    'TASKS_EAGER', str(not PRODUCTION and not DATABASE_REPLICAS)) == 'True'
+TASKS_MAX_ATTEMPTS = 5
+# Пауза перед повтором в секундах, удваивается с каждой попыткой
+TASKS_RETRY_DELAY = 10
+# Через сколько секунд задача упавшего воркера возвращается в очередь
+TASKS_LOCK_TIMEOUT = 60 * 10
+
+# Кэш общий для всех воркеров: sqlite (файл на узле), redis или memcached.
+# Счётчики версий лент требуют атомарного incr, поэтому locmem годится
+# только для одного процесса.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'sqlite': 'posts.cache_backends.SQLiteCache',
+    'memcached': 'django.core.cache.backends.memcached.PyLibMCCache',
+    'redis': 'django_redis.cache.RedisCache',
+}
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'sqlite')],
+        'LOCATION': os.getenv('CACHE_LOCATION',
+                              os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
+
+# Тесты получают свой кэш в памяти процесса: их cache.clear() не стирает
+# кэш сервера разработки, а параллельные прогоны не делят один файл
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    CACHES['default'] = {'BACKEND': CACHE_BACKENDS['locmem'],
+                         'LOCATION': 'yatube-tests'}
+
+POSTS_CACHE = 'default'
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Количества постов для паджинатора; ленты подписок обновляются только
+# по истечении срока, остальные — при записи
+POSTS_COUNT_TIMEOUT = 60 * 10
+
+# Замеры по представлениям: /metrics/ (Prometheus) и /metrics/?format=json.
+# Доступ в DEBUG, для staff или с заголовком Authorization: Bearer <токен>.
+METRICS_ENABLED = True
+METRICS_WINDOW = 1000
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')